@@ -0,0 +1,214 @@
+"""Пакетная запись постов, комментариев и подписок.
+
+Каждая операция проверяется теми же формами, что и в post_create и
+add_comment, но все ссылки (группы, посты, авторы) загружаются заранее
+по одному запросу на вид. Прошедшие проверку операции вставляются
+через bulk_create в одной транзакции. bulk_create не посылает
+сигналы, поэтому счётчики, ленты и сброс кеша, которые для одиночных
+записей делают обработчики из posts.signals, здесь применяются один
+раз на всю пачку.
+"""
+from collections import Counter
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from core import metrics
+from posts import caching, counters, feeds
+from posts.forms import CommentForm, PostForm
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class BatchError(ValueError):
+    pass
+
+
+class BatchPostForm(PostForm):
+    """PostForm, берущий группы из заранее загруженного словаря."""
+
+    def __init__(self, *args, groups, **kwargs):
+        super().__init__(*args, **kwargs)
+        field = self.fields['group']
+
+        def to_python(value):
+            if value in field.empty_values:
+                return None
+            try:
+                return groups[int(value)]
+            except (KeyError, TypeError, ValueError):
+                raise ValidationError(
+                    field.error_messages['invalid_choice'],
+                    code='invalid_choice',
+                )
+        field.to_python = to_python
+
+    def _get_validation_exclusions(self):
+        # Группа уже найдена в словаре: повторная проверка внешнего
+        # ключа в модели стоила бы запроса на каждый пост.
+        return super()._get_validation_exclusions() + ['group']
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _error(**errors):
+    return {'status': 'error',
+            'errors': {field: [message] for field, message in errors.items()}}
+
+
+def _form_error(form):
+    return {'status': 'error', 'errors': {
+        field: [error['message'] for error in errors]
+        for field, errors in form.errors.get_json_data().items()
+    }}
+
+
+def _bulk_insert(model, objects):
+    model.objects.bulk_create(objects)
+    if objects and objects[0].pk is None:
+        # SQLite не возвращает ключи из bulk_create. Первый INSERT
+        # берёт блокировку записи до конца транзакции, поэтому наши
+        # строки получили последние len(objects) ключей подряд.
+        last = model.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        )[0]
+        for pk, obj in zip(range(last - len(objects) + 1, last + 1),
+                           objects):
+            obj.pk = pk
+            obj._state.adding = False
+
+
+def _prefetch(user, operations):
+    group_ids, post_ids, usernames = set(), set(), set()
+    for operation in operations:
+        kind = operation.get('op')
+        if kind == 'post' and _int(operation.get('group')) is not None:
+            group_ids.add(_int(operation['group']))
+        elif kind == 'comment' and _int(operation.get('post')) is not None:
+            post_ids.add(_int(operation['post']))
+        elif kind == 'follow' and isinstance(operation.get('author'), str):
+            usernames.add(operation['author'])
+    authors = dict(User.objects.filter(
+        username__in=usernames
+    ).values_list('username', 'pk')) if usernames else {}
+    return {
+        'groups': Group.objects.in_bulk(group_ids) if group_ids else {},
+        'posts': set(Post.objects.filter(pk__in=post_ids).values_list(
+            'pk', flat=True
+        )) if post_ids else set(),
+        'authors': authors,
+        'following': set(Follow.objects.filter(
+            user=user, author_id__in=authors.values()
+        ).values_list('author_id', flat=True)) if authors else set(),
+    }
+
+
+def _check_post(user, operation, known):
+    form = BatchPostForm(data=operation, groups=known['groups'])
+    if not form.is_valid():
+        return _form_error(form), None
+    post = form.save(commit=False)
+    post.author = user
+    return None, post
+
+
+def _check_comment(user, operation, known):
+    post_id = _int(operation.get('post'))
+    if post_id not in known['posts']:
+        return _error(post='Пост не найден.'), None
+    form = CommentForm(data=operation)
+    if not form.is_valid():
+        return _form_error(form), None
+    comment = form.save(commit=False)
+    comment.author = user
+    comment.post_id = post_id
+    return None, comment
+
+
+def _check_follow(user, operation, known):
+    author_id = known['authors'].get(operation.get('author'))
+    if author_id is None:
+        return _error(author='Автор не найден.'), None
+    if author_id == user.pk:
+        return _error(author='Нельзя подписаться на себя.'), None
+    if author_id in known['following']:
+        return {'status': 'exists'}, None
+    known['following'].add(author_id)
+    return None, Follow(user=user, author_id=author_id)
+
+
+CHECKS = {
+    'post': _check_post,
+    'comment': _check_comment,
+    'follow': _check_follow,
+}
+
+
+def _validate(user, operations, known):
+    results = [None] * len(operations)
+    created = {kind: [] for kind in CHECKS}
+    for index, operation in enumerate(operations):
+        kind = operation.get('op')
+        if kind not in CHECKS:
+            results[index] = _error(op='Ожидается post, comment или follow.')
+            continue
+        results[index], obj = CHECKS[kind](user, operation, known)
+        if obj is not None:
+            created[kind].append((index, obj))
+    return results, created['post'], created['comment'], created['follow']
+
+
+def _apply_side_effects(user, posts, comments, follows):
+    if posts:
+        counters.change_user_counters(user.pk, posts_count=len(posts))
+        feeds.fan_out_posts(user.pk, posts)
+        metrics.ACTIONS.inc(len(posts), action='post_create')
+    if comments:
+        counters.add_comments_counts(
+            Counter(comment.post_id for comment in comments)
+        )
+        metrics.ACTIONS.inc(len(comments), action='add_comment')
+    caching.bump_batch_generations(
+        posts, {comment.post_id for comment in comments}
+    )
+    if follows:
+        author_ids = [follow.author_id for follow in follows]
+        counters.change_user_counters(user.pk,
+                                      following_count=len(follows))
+        feeds.backfill_timelines(
+            user.pk, counters.change_followers_counts(author_ids, 1)
+        )
+        caching.bump_feed_versions([user.pk])
+        metrics.ACTIONS.inc(len(follows), action='profile_follow')
+
+
+def apply_batch(user, operations):
+    """Выполняет операции от имени user, возвращает результат каждой.
+
+    Ошибка в одной операции не отменяет остальные: её результат
+    содержит ошибки формы, остальные записываются.
+    """
+    if not isinstance(operations, list) or not all(
+            isinstance(operation, dict) for operation in operations):
+        raise BatchError('operations должен быть списком объектов.')
+    if len(operations) > settings.API_BATCH_LIMIT:
+        raise BatchError(
+            f'Не больше {settings.API_BATCH_LIMIT} операций за запрос.'
+        )
+    known = _prefetch(user, operations)
+    results, posts, comments, follows = _validate(user, operations, known)
+    with transaction.atomic():
+        for model, created in ((Post, posts), (Comment, comments),
+                               (Follow, follows)):
+            _bulk_insert(model, [obj for _, obj in created])
+        _apply_side_effects(user, [post for _, post in posts],
+                            [comment for _, comment in comments],
+                            [follow for _, follow in follows])
+    for index, obj in posts + comments + follows:
+        results[index] = {'status': 'created', 'id': obj.pk}
+    return results
@@ -0,0 +1,77 @@
+"""Сериализация строк .values() в словари ответа API.
+
+Поле ответа описывается столбцом для .values() и необязательным
+преобразованием значения. Запрашиваются только столбцы выбранных
+полей, поэтому, например, без поля author не будет и JOIN с
+таблицей пользователей.
+"""
+from django.core.files.storage import default_storage
+
+from core.storage import is_staged
+
+
+class FieldError(ValueError):
+    pass
+
+
+def _date(value):
+    return value.isoformat()
+
+
+def _media_url(value):
+    # Необработанная загрузка ещё не опубликована.
+    if not value or is_staged(value):
+        return None
+    return default_storage.url(value)
+
+
+POST_FIELDS = {
+    'id': ('id', None),
+    'text': ('text', None),
+    'pub_date': ('pub_date', _date),
+    'author': ('author__username', None),
+    'group': ('group__slug', None),
+    'image': ('image', _media_url),
+    'comments_count': ('comments_count', None),
+}
+COMMENT_FIELDS = {
+    'id': ('id', None),
+    'text': ('text', None),
+    'created': ('created', _date),
+    'author': ('author__username', None),
+    'post': ('post_id', None),
+}
+
+
+def requested_fields(raw):
+    """Имена из ?fields=id,text без пробелов и повторов, по порядку."""
+    return list(dict.fromkeys(
+        name.strip() for name in (raw or '').split(',') if name.strip()
+    ))
+
+
+def parse_fields(raw, spec):
+    """Поля из параметра ?fields=id,text; без параметра — все поля."""
+    if not raw:
+        return list(spec)
+    names = requested_fields(raw)
+    unknown = [name for name in names if name not in spec]
+    if unknown:
+        raise FieldError(f'Неизвестные поля: {", ".join(unknown)}')
+    return names
+
+
+def columns(spec, names, required=()):
+    """Столбцы для .values(): выбранные поля и нужные для курсора."""
+    return list(dict.fromkeys(
+        [spec[name][0] for name in names] + list(required)
+    ))
+
+
+def serialize(rows, spec, names):
+    fields = [(name, *spec[name]) for name in names]
+    return [
+        {name: convert(row[column]) if convert and row[column] is not None
+         else row[column] for name, column, convert in fields}
+        for row in rows
+    ]
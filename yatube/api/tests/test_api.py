@@ -0,0 +1,123 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(ENTRIES_THE_PAGE=2, COMMENTS_THE_PAGE=2)
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username="author")
+        cls.reader = User.objects.create(username="reader")
+        cls.group = Group.objects.create(
+            title="Группа", slug="group", description="Описание"
+        )
+        cls.posts = [
+            Post.objects.create(author=cls.author, text=f"Пост {i}",
+                                group=cls.group if i % 2 else None)
+            for i in range(5)
+        ]
+        for i in range(3):
+            Comment.objects.create(post=cls.posts[0], author=cls.reader,
+                                   text=f"Комментарий {i}")
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def collect(self, url, **params):
+        """Все страницы ответа, пройденные по курсору next."""
+        results = []
+        while True:
+            data = self.client.get(url, params).json()
+            results += data['results']
+            if data['next'] is None:
+                return results
+            params['after'] = data['next']
+
+    def test_index_pages_by_cursor(self):
+        """Лента отдаётся страницами по курсору без пропусков и повторов."""
+        results = self.collect(reverse('api:index'), fields='id')
+        self.assertEqual(results,
+                         [{'id': post.pk} for post in self.posts[::-1]])
+
+    def test_sparse_fields(self):
+        """?fields ограничивает поля ответа, неизвестное поле — ошибка."""
+        url = reverse('api:post_detail', kwargs={'post_id': self.posts[1].pk})
+        self.assertEqual(
+            self.client.get(url, {'fields': 'text,author,group'}).json(),
+            {'text': 'Пост 1', 'author': 'author', 'group': 'group'},
+        )
+        response = self.client.get(url, {'fields': 'id,password'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_group_and_profile(self):
+        """Ленты группы и автора содержат только свои посты."""
+        group = self.collect(
+            reverse('api:group_posts', kwargs={'slug': 'group'}),
+            fields='id',
+        )
+        self.assertEqual(
+            group, [{'id': post.pk} for post in self.posts[1::2][::-1]]
+        )
+        profile = self.client.get(reverse(
+            'api:profile_posts', kwargs={'username': 'reader'}
+        )).json()
+        self.assertEqual(profile, {'results': [], 'next': None})
+        missing = self.client.get(
+            reverse('api:group_posts', kwargs={'slug': 'missing'})
+        )
+        self.assertEqual(missing.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_comments_oldest_first(self):
+        """Комментарии идут от старых к новым."""
+        results = self.collect(
+            reverse('api:post_comments',
+                    kwargs={'post_id': self.posts[0].pk}),
+            fields='text',
+        )
+        self.assertEqual([row['text'] for row in results],
+                         [f"Комментарий {i}" for i in range(3)])
+
+    def test_etag_revalidation(self):
+        """Неизменившаяся лента отдаётся ответом 304."""
+        url = reverse('api:index')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        Post.objects.create(author=self.author, text="Новый пост")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_follow_feed(self):
+        """Лента подписок требует входа и меняет ETag после подписки."""
+        url = reverse('api:follow_feed')
+        self.assertEqual(self.client.get(url).status_code,
+                         HTTPStatus.UNAUTHORIZED)
+        self.client.force_login(self.reader)
+        empty = self.client.get(url)
+        self.assertEqual(empty.json()['results'], [])
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.client.get(url, {'fields': 'id'},
+                                   HTTP_IF_NONE_MATCH=empty['ETag'])
+        self.assertEqual(response.json()['results'],
+                         [{'id': post.pk} for post in self.posts[:2:-1]])
+
+    def test_follow_feed_pages_with_other_followers(self):
+        """Записи ленты других подписчиков не размножают посты."""
+        for i in range(3):
+            follower = User.objects.create(username=f"follower{i}")
+            Follow.objects.create(user=follower, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.client.force_login(self.reader)
+        results = self.collect(reverse('api:follow_feed'), fields='id')
+        self.assertEqual(results,
+                         [{'id': post.pk} for post in self.posts[::-1]])
@@ -0,0 +1,114 @@
+import json
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.caching import GLOBAL_GENERATION_KEY, generation
+from posts.feeds import timeline_posts
+from posts.models import Comment, Follow, Group, Post, UserCounters
+
+User = get_user_model()
+
+
+class BatchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.writer = User.objects.create(username="writer")
+        cls.author = User.objects.create(username="author")
+        cls.follower = User.objects.create(username="follower")
+        cls.group = Group.objects.create(
+            title="Группа", slug="group", description="Описание"
+        )
+        cls.post = Post.objects.create(author=cls.author, text="Пост")
+        Follow.objects.create(user=cls.follower, author=cls.writer)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.writer)
+
+    def send(self, operations):
+        return self.client.post(
+            reverse('api:batch'), json.dumps({'operations': operations}),
+            content_type='application/json',
+        )
+
+    def operations(self, count):
+        return (
+            [{'op': 'post', 'text': f'Пост {i}', 'group': self.group.pk}
+             for i in range(count)]
+            + [{'op': 'comment', 'post': self.post.pk,
+                'text': f'Комментарий {i}'} for i in range(count)]
+        )
+
+    def test_items_created_with_side_effects(self):
+        """Пачка создаёт записи и обновляет счётчики, ленты и кеш."""
+        before = generation(GLOBAL_GENERATION_KEY)
+        response = self.send(self.operations(3) + [
+            {'op': 'follow', 'author': 'author'},
+        ])
+        results = response.json()['results']
+        self.assertEqual({result['status'] for result in results},
+                         {'created'})
+        posts = Post.objects.filter(author=self.writer).order_by('pk')
+        self.assertEqual([result['id'] for result in results[:3]],
+                         [post.pk for post in posts])
+        self.assertEqual(list(timeline_posts(self.follower)),
+                         list(posts)[::-1])
+        self.assertEqual(list(timeline_posts(self.writer)), [self.post])
+        counters = UserCounters.objects.get(user=self.writer)
+        self.assertEqual(
+            (counters.posts_count, counters.following_count), (3, 1)
+        )
+        self.assertEqual(
+            UserCounters.objects.get(user=self.author).followers_count, 1
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 3)
+        self.assertNotEqual(generation(GLOBAL_GENERATION_KEY), before)
+
+    def test_query_count_independent_of_batch_size(self):
+        """Число запросов не растёт с размером пачки."""
+        self.send(self.operations(1))
+        with CaptureQueriesContext(connection) as small:
+            self.send(self.operations(2))
+        with self.assertNumQueries(len(small)):
+            self.send(self.operations(20))
+
+    def test_invalid_items_reported_others_applied(self):
+        """Ошибочные операции не мешают остальным."""
+        results = self.send([
+            {'op': 'post', 'text': ''},
+            {'op': 'post', 'text': 'Пост', 'group': 999},
+            {'op': 'comment', 'post': 999, 'text': 'Текст'},
+            {'op': 'follow', 'author': 'writer'},
+            {'op': 'delete'},
+            {'op': 'post', 'text': 'Годный пост'},
+        ]).json()['results']
+        self.assertEqual([result['status'] for result in results],
+                         ['error'] * 5 + ['created'])
+        self.assertIn('text', results[0]['errors'])
+        self.assertIn('group', results[1]['errors'])
+        self.assertEqual(Post.objects.filter(author=self.writer).count(), 1)
+        self.assertFalse(Comment.objects.exists())
+
+    def test_repeated_follow_reported_as_existing(self):
+        """Повторная подписка не создаёт дубликат."""
+        operation = {'op': 'follow', 'author': 'author'}
+        results = self.send([operation, operation]).json()['results']
+        self.assertEqual([result['status'] for result in results],
+                         ['created', 'exists'])
+
+    def test_requires_login_and_valid_body(self):
+        """Пачка требует входа и тела вида {"operations": [...]}."""
+        self.assertEqual(self.client.post(
+            reverse('api:batch'), '[]', content_type='application/json'
+        ).status_code, HTTPStatus.BAD_REQUEST)
+        self.client.logout()
+        self.assertEqual(self.send([]).status_code, HTTPStatus.UNAUTHORIZED)
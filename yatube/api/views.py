@@ -0,0 +1,180 @@
+import heapq
+import json
+from itertools import islice
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import quote_etag
+from django.views.decorators.http import require_POST
+
+from core.query_budget import query_budget
+from posts.caching import (
+    conditional_page, feed_version, group_generation_keys,
+    index_generation_keys, post_generation_keys, profile_generation_keys
+)
+from posts.feeds import follow_sources, followed_authors
+from posts.models import Comment, Group, Post, User
+from posts.utils import (
+    cursor_source, decode_cursor, encode_position, seek
+)
+
+from .batch import BatchError, apply_batch
+from .serializers import (
+    COMMENT_FIELDS, POST_FIELDS, FieldError, columns, parse_fields,
+    requested_fields, serialize
+)
+
+
+def _fields_key(request):
+    """Выбранные поля для ключа кеша анонимной страницы."""
+    return ','.join(requested_fields(request.GET.get('fields')))
+
+
+def _json(data, status=200):
+    return JsonResponse(data, status=status, json_dumps_params={
+        'ensure_ascii': False, 'separators': (',', ':'),
+    })
+
+
+def _error(detail, status):
+    return _json({'detail': detail}, status)
+
+
+def _page(request, sources, spec, date, per_page, newest_first=True):
+    """Страница по курсору (дата, id), слитая из нескольких источников.
+
+    Из каждого источника берётся не больше per_page + 1 строк: этого
+    хватает и для страницы, и чтобы узнать, есть ли следующая.
+    """
+    try:
+        names = parse_fields(request.GET.get('fields'), spec)
+    except FieldError as error:
+        return _error(str(error), 400)
+    values = columns(spec, names, required=(date, 'id'))
+    cursor = decode_cursor(request.GET.get('after'))
+    rows = heapq.merge(
+        *(seek(source, cursor, newest_first).values(*values)[:per_page + 1]
+          for source in sources),
+        key=itemgetter(date, 'id'), reverse=newest_first,
+    )
+    rows = list(islice(rows, per_page + 1))
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_position(rows[-1][date], rows[-1]['id'])
+    return _json({
+        'results': serialize(rows, spec, names),
+        'next': next_cursor,
+    })
+
+
+def _posts_page(request, *sources):
+    return _page(request, sources, POST_FIELDS, 'pub_date',
+                 settings.ENTRIES_THE_PAGE)
+
+
+@query_budget(3)
+@conditional_page(index_generation_keys, vary_on=_fields_key)
+def index(request):
+    return _posts_page(request, cursor_source(Post.objects.all()))
+
+
+@query_budget(5)
+@conditional_page(group_generation_keys, vary_on=_fields_key)
+def group_posts(request, slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True
+    ).first()
+    if group_id is None:
+        return _error('Группа не найдена', 404)
+    return _posts_page(request, cursor_source(Post.objects.filter(
+        group_id=group_id
+    )))
+
+
+@query_budget(5)
+@conditional_page(profile_generation_keys, vary_on=_fields_key)
+def profile_posts(request, username):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True
+    ).first()
+    if author_id is None:
+        return _error('Автор не найден', 404)
+    return _posts_page(request, cursor_source(Post.objects.filter(
+        author_id=author_id
+    )))
+
+
+@query_budget(4)
+@conditional_page(post_generation_keys, vary_on=_fields_key)
+def post_detail(request, post_id):
+    try:
+        names = parse_fields(request.GET.get('fields'), POST_FIELDS)
+    except FieldError as error:
+        return _error(str(error), 400)
+    row = Post.objects.filter(pk=post_id).values(
+        *columns(POST_FIELDS, names)
+    ).first()
+    if row is None:
+        return _error('Пост не найден', 404)
+    return _json(serialize([row], POST_FIELDS, names)[0])
+
+
+@query_budget(5)
+@conditional_page(post_generation_keys, vary_on=_fields_key)
+def post_comments(request, post_id):
+    if not Post.objects.filter(pk=post_id).exists():
+        return _error('Пост не найден', 404)
+    return _page(
+        request, [cursor_source(Comment.objects.filter(post_id=post_id),
+                                date='created')],
+        COMMENT_FIELDS, 'created', settings.COMMENTS_THE_PAGE,
+        newest_first=False,
+    )
+
+
+@query_budget(5)
+def follow_feed(request):
+    """Лента подписок: из TimelineEntry и из постов «знаменитостей».
+
+    ETag строится по версии ленты, поэтому неизменившаяся лента
+    отдаётся ответом 304 без чтения постов.
+    """
+    if not request.user.is_authenticated:
+        return _error('Требуется авторизация', 401)
+    authors, celebrities = followed_authors(request.user)
+    etag = quote_etag(feed_version(request.user, authors))
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = _posts_page(
+            request, *follow_sources(request.user, celebrities)
+        )
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+        patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+@require_POST
+def batch(request):
+    """Пакетная запись: {"operations": [{"op": "post", "text": ...}, ...]}.
+
+    Операции post и comment принимают поля PostForm и CommentForm
+    (для комментария ещё post — id поста), follow — author, имя автора.
+    """
+    if not request.user.is_authenticated:
+        return _error('Требуется авторизация', 401)
+    try:
+        operations = json.loads(request.body)['operations']
+        results = apply_batch(request.user, operations)
+    except (ValueError, KeyError, TypeError) as error:
+        detail = str(error) if isinstance(error, BatchError) else (
+            'Ожидается JSON вида {"operations": [...]}'
+        )
+        return _error(detail, 400)
+    except IntegrityError:
+        return _error('Пачка конфликтует с параллельной записью', 409)
+    return _json({'results': results})
@@ -1,5 +1,22 @@
 from django.apps import AppConfig
+from django.core.cache import cache
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
+
+
+def clear_cache(**kwargs):
+    # Общий кеш переживает процессы, а после миграции сохранённые
+    # страницы и объекты могут не совпадать со схемой. Заодно каждая
+    # тестовая база начинает с пустым кешем.
+    cache.clear()
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from .slow_queries import install
+
+        connection_created.connect(install, dispatch_uid='slow_queries')
+        post_migrate.connect(clear_cache, sender=self,
+                             dispatch_uid='clear_cache')
@@ -0,0 +1,99 @@
+import json
+import math
+import time
+
+from django.core.cache import cache
+from django.test import Client
+from django.urls import reverse
+
+from .query_budget import inspect_queries
+
+# Маршруты, которые меняют данные или сессию при GET.
+SKIPPED_ROUTES = {
+    'users:logout',
+    'posts:profile_follow',
+    'posts:profile_unfollow',
+}
+METRICS = ('p50_ms', 'p95_ms', 'p99_ms')
+
+
+def percentile(samples, percent):
+    """Перцентиль по методу ближайшего ранга."""
+    ordered = sorted(samples)
+    rank = math.ceil(percent / 100 * len(ordered))
+    return ordered[max(rank, 1) - 1]
+
+
+def routes(url_modules):
+    """Именованные маршруты модулей вида (namespace, urlpatterns)."""
+    for namespace, urlpatterns in url_modules:
+        for pattern in urlpatterns:
+            name = f'{namespace}:{pattern.name}'
+            if pattern.name and name not in SKIPPED_ROUTES:
+                yield name, list(pattern.pattern.converters)
+
+
+def measure(client, url, requests, cold=False):
+    timings, queries = [], []
+    for _ in range(requests):
+        if cold:
+            cache.clear()
+        with inspect_queries() as log:
+            started = time.perf_counter()
+            response = client.get(url)
+            timings.append((time.perf_counter() - started) * 1000)
+        queries.append(len(log))
+    return {
+        'url': url,
+        'status': response.status_code,
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'queries': max(queries),
+        'bytes': len(response.content),
+    }
+
+
+def run(url_modules, url_kwargs, user, requests, cold=False):
+    """Замеряет каждый маршрут от имени user.
+
+    url_kwargs сопоставляет имя параметра маршрута и его значение.
+    """
+    client = Client()
+    client.force_login(user)
+    cache.clear()
+    results = {}
+    for name, params in routes(url_modules):
+        url = reverse(name, kwargs={key: url_kwargs[key] for key in params})
+        results[name] = measure(client, url, requests, cold)
+    return results
+
+
+def regressions(results, baseline, threshold):
+    """Маршруты, ставшие медленнее базовых более чем на threshold.
+
+    Рост числа запросов считается регрессией при любом пороге.
+    """
+    found = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        for metric in METRICS:
+            if current[metric] > previous[metric] * (1 + threshold):
+                found.append((name, metric, previous[metric],
+                              current[metric]))
+        if current['queries'] > previous['queries']:
+            found.append((name, 'queries', previous['queries'],
+                          current['queries']))
+    return found
+
+
+def load(path):
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def dump(report, path):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2, sort_keys=True)
@@ -0,0 +1,134 @@
+import platform
+import time
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from about import urls as about_urls
+from core import benchmark
+from posts import urls as posts_urls
+from posts.models import Group, Post
+from posts.seeding import (
+    DEFAULT_VOLUMES, planned_volumes, seed, seeded_volumes
+)
+from users import urls as users_urls
+
+URL_MODULES = [
+    ('posts', posts_urls.urlpatterns),
+    ('users', users_urls.urlpatterns),
+    ('about', about_urls.urlpatterns),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет p50/p95/p99, число запросов и размер ответа каждого '
+        'маршрута posts, users и about на наполненной базе.'
+    )
+
+    def add_arguments(self, parser):
+        for name, default in DEFAULT_VOLUMES.items():
+            parser.add_argument(f'--{name}', type=int, default=default)
+        parser.add_argument('--requests', type=int, default=50,
+                            help='Запросов на маршрут.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--cold', action='store_true',
+                            help='Очищать кеш перед каждым запросом.')
+        parser.add_argument('--output', help='Куда записать JSON.')
+        parser.add_argument('--baseline', help='JSON прошлого прогона.')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Допустимый рост латентности, доля.')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Не удалять тестовую базу после прогона.')
+        parser.add_argument('--in-place', action='store_true',
+                            help='Наполнить текущую базу вместо тестовой.')
+
+    def handle(self, *args, **options):
+        if options['in_place']:
+            report = self.run(options)
+        else:
+            old_name = connection.settings_dict['NAME']
+            connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, keepdb=options['keepdb']
+            )
+            try:
+                report = self.run(options)
+            finally:
+                connection.creation.destroy_test_db(
+                    old_name, verbosity=0, keepdb=options['keepdb']
+                )
+        if options['output']:
+            benchmark.dump(report, options['output'])
+        for name, result in sorted(report['results'].items()):
+            self.stdout.write(
+                '{name:40} {status} p50={p50_ms}ms p95={p95_ms}ms '
+                'p99={p99_ms}ms queries={queries} bytes={bytes}'.format(
+                    name=name, **result
+                )
+            )
+        if options['baseline']:
+            self.compare(report, options)
+
+    def run(self, options):
+        volumes = {name: options[name] for name in DEFAULT_VOLUMES}
+        started = time.perf_counter()
+        reused = self.prepare(volumes, options)
+        seeded = time.perf_counter() - started
+        post = Post.objects.select_related('author', 'group').latest('pk')
+        group = post.group or Group.objects.first()
+        url_kwargs = {
+            'post_id': post.pk,
+            'username': post.author.username,
+            'slug': group.slug if group else 'missing',
+            'uidb64': 'AA',
+            'token': 'set-password',
+        }
+        results = benchmark.run(
+            URL_MODULES, url_kwargs, post.author, options['requests'],
+            cold=options['cold'],
+        )
+        return {
+            'meta': {
+                'volumes': volumes,
+                'requests': options['requests'],
+                'cold': options['cold'],
+                'seed_seconds': round(seeded, 1),
+                'reused_db': reused,
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'users_total': get_user_model().objects.count(),
+            },
+            'results': results,
+        }
+
+    def prepare(self, volumes, options):
+        """Наполняет базу. Возвращает True, если данные уже были.
+
+        Тестовая база, сохранённая через --keepdb, наполняется только
+        в первый прогон: иначе данные росли бы с каждым запуском и
+        прогоны нельзя было бы сравнивать.
+        """
+        if options['keepdb'] and not options['in_place']:
+            found = seeded_volumes()
+            if any(found.values()):
+                if found != planned_volumes(**volumes):
+                    raise CommandError(
+                        f'В сохранённой базе другие объёмы ({found}): '
+                        'запустите без --keepdb, чтобы пересоздать её.'
+                    )
+                return True
+        seed(random_seed=options['seed'], **volumes)
+        return False
+
+    def compare(self, report, options):
+        baseline = benchmark.load(options['baseline'])
+        found = benchmark.regressions(
+            report['results'], baseline['results'], options['threshold']
+        )
+        for name, metric, before, after in found:
+            self.stderr.write(f'{name}: {metric} {before} -> {after}')
+        if found:
+            raise CommandError(f'Регрессий относительно базы: {len(found)}')
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
@@ -0,0 +1,55 @@
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.slow_queries import read_records
+
+SHAPE_WIDTH = 120
+
+
+class Command(BaseCommand):
+    help = (
+        'Сводка журнала медленных запросов по формам запросов: '
+        'число, суммарное и среднее время.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', default=settings.SLOW_QUERY_LOG,
+                            help='Путь к журналу.')
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--sort', choices=('total', 'mean', 'count'),
+                            default='total')
+        parser.add_argument('--plans', action='store_true',
+                            help='Показать план самого медленного запроса.')
+
+    def handle(self, *args, **options):
+        groups = defaultdict(list)
+        for record in read_records(options['log']):
+            groups[record['shape']].append(record)
+        if not groups:
+            self.stdout.write('Медленных запросов нет')
+            return
+        summary = []
+        for shape, records in groups.items():
+            durations = [record['duration_ms'] for record in records]
+            summary.append({
+                'shape': shape,
+                'count': len(records),
+                'total': sum(durations),
+                'mean': sum(durations) / len(durations),
+                'slowest': max(records, key=lambda r: r['duration_ms']),
+                'views': Counter(record['view'] for record in records),
+            })
+        summary.sort(key=lambda row: row[options['sort']], reverse=True)
+        for row in summary[:options['limit']]:
+            view, _ = row['views'].most_common(1)[0]
+            self.stdout.write(
+                f"{row['count']:>6} раз  всего {row['total']:>10.1f} мс  "
+                f"среднее {row['mean']:>8.1f} мс  {view or '-'}"
+            )
+            self.stdout.write(f"    {row['shape'][:SHAPE_WIDTH]}")
+            self.stdout.write(f"    источник: {row['slowest']['source']}")
+            if options['plans'] and row['slowest']['plan']:
+                for step in row['slowest']['plan']:
+                    self.stdout.write(f'      {step}')
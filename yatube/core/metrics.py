@@ -0,0 +1,239 @@
+"""Реестр метрик в текстовом формате Prometheus.
+
+Каждый процесс копит значения в памяти и не чаще раза в
+METRICS_FLUSH_INTERVAL секунд сбрасывает их в свой файл METRICS_DIR/
+<pid>-<время запуска>.json. Страница /metrics суммирует файлы всех
+процессов, поэтому цифры верны и при нескольких WSGI-воркерах.
+Сэмплы завершившихся процессов переносятся в общий итог aggregate.json,
+чтобы счётчики не уменьшались, а время запуска в имени не даёт новому
+процессу с тем же pid дописать чужие значения.
+Гистограммы хранятся как набор сэмплов _bucket/_sum/_count, так что
+и они складываются простым суммированием.
+"""
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+AGGREGATE_FILE = 'aggregate.json'
+LOCK_FILE = '.lock'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+
+class Registry:
+    def __init__(self):
+        self.families = {}
+        self.samples = defaultdict(float)
+        self.lock = threading.Lock()
+        self.flushed = time.monotonic()
+        self.pid = None
+        self.started = None
+
+    def add(self, name, labels, amount):
+        with self.lock:
+            self.samples[name, tuple(sorted(labels.items()))] += amount
+
+    def path(self):
+        pid = os.getpid()
+        if pid != self.pid:
+            # Реестр создан до fork: у дочернего процесса свой файл.
+            self.pid, self.started = pid, time.time_ns()
+        return os.path.join(settings.METRICS_DIR,
+                            f'{pid}-{self.started}.json')
+
+    def flush(self, force=False):
+        now = time.monotonic()
+        if not force and now - self.flushed < settings.METRICS_FLUSH_INTERVAL:
+            return
+        with self.lock:
+            self.flushed = now
+            samples = dict(self.samples)
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        _write(self.path(), samples)
+
+    def fold(self, path):
+        """Переносит сэмплы завершившегося процесса в общий итог."""
+        aggregate = os.path.join(settings.METRICS_DIR, AGGREGATE_FILE)
+        with open(os.path.join(settings.METRICS_DIR, LOCK_FILE), 'a') as lock:
+            # Параллельный сбор мог уже перенести этот файл.
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            samples = _read(path)
+            if samples is None:
+                return
+            total = defaultdict(float, _read(aggregate) or {})
+            for sample, value in samples.items():
+                total[sample] += value
+            _write(aggregate, total)
+            _remove(path)
+
+    def collect(self):
+        """Сумма сэмплов всех процессов, в том числе завершившихся."""
+        self.flush(force=True)
+        for name in os.listdir(settings.METRICS_DIR):
+            if name.endswith('.json') and name != AGGREGATE_FILE and (
+                    not _alive(name[:-len('.json')].split('-')[0])):
+                self.fold(os.path.join(settings.METRICS_DIR, name))
+        total = defaultdict(float)
+        for name in os.listdir(settings.METRICS_DIR):
+            if not name.endswith('.json'):
+                continue
+            samples = _read(os.path.join(settings.METRICS_DIR, name))
+            for sample, value in (samples or {}).items():
+                total[sample] += value
+        return total
+
+    def render(self):
+        samples = self.collect()
+        lines = []
+        for family in self.families.values():
+            lines.append(f'# HELP {family.name} {family.help}')
+            lines.append(f'# TYPE {family.name} {family.kind}')
+            for (name, labels), value in sorted(
+                    samples.items(), key=_sample_order):
+                if name in family.sample_names:
+                    lines.append(f'{name}{_labels(labels)} {_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        with self.lock:
+            self.samples.clear()
+        if os.path.exists(self.path()):
+            os.remove(self.path())
+
+
+registry = Registry()
+
+
+def _alive(pid):
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except (ValueError, PermissionError):
+        # Имя не из pid или процесс другого пользователя: не трогаем.
+        pass
+    return True
+
+
+def _read(path):
+    """Сэмплы из файла процесса или None, если файла нет."""
+    try:
+        with open(path) as file:
+            data = json.load(file)
+    except (OSError, ValueError):
+        return None
+    return {(name, tuple(map(tuple, labels))): value
+            for name, labels, value in data}
+
+
+def _write(path, samples):
+    # Пишем во временный файл и переименовываем: читатель никогда
+    # не увидит файл наполовину записанным.
+    fd, temp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'w') as file:
+        json.dump([[name, labels, value]
+                   for (name, labels), value in samples.items()], file)
+    os.replace(temp, path)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _sample_order(item):
+    (name, labels), _ = item
+    # Корзины гистограммы выводятся по возрастанию границы le.
+    return name, [(key, float(value) if key == 'le' else value)
+                  for key, value in labels]
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace(
+        '\n', r'\n'
+    )
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(
+        f'{key}="{_escape(value)}"' for key, value in labels
+    ) + '}'
+
+
+def _number(value):
+    return repr(int(value)) if value == int(value) else repr(value)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.sample_names = {name}
+        registry.families[name] = self
+
+    def inc(self, amount=1, **labels):
+        registry.add(self.name, labels, amount)
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help, buckets):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.sample_names = {f'{name}_bucket', f'{name}_sum',
+                             f'{name}_count'}
+        registry.families[name] = self
+
+    def observe(self, value, **labels):
+        # Корзины кумулятивные, как требует формат Prometheus.
+        for bound in self.buckets:
+            if value <= bound:
+                registry.add(f'{self.name}_bucket',
+                             {**labels, 'le': _number(bound)}, 1)
+        registry.add(f'{self.name}_bucket', {**labels, 'le': '+Inf'}, 1)
+        registry.add(f'{self.name}_sum', labels, value)
+        registry.add(f'{self.name}_count', labels, 1)
+
+
+REQUEST_DURATION = Histogram(
+    'yatube_request_duration_seconds',
+    'Время ответа по представлениям.',
+    LATENCY_BUCKETS,
+)
+REQUEST_QUERIES = Histogram(
+    'yatube_request_queries',
+    'Число SQL-запросов на ответ по представлениям.',
+    QUERY_BUCKETS,
+)
+CACHE_REQUESTS = Counter(
+    'yatube_cache_requests_total',
+    'Обращения к кешу по алиасам: попадания, промахи и записи.',
+)
+THUMBNAILS = Counter(
+    'yatube_thumbnails_generated_total',
+    'Сгенерированные миниатюры.',
+)
+ACTIONS = Counter(
+    'yatube_actions_total',
+    'Действия пользователей: посты, комментарии, подписки.',
+)
+
+
+def observe_request(view, seconds, queries):
+    REQUEST_DURATION.observe(seconds, view=view)
+    REQUEST_QUERIES.observe(queries, view=view)
+    registry.flush()
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 
 
 class CreatedModel(models.Model):
@@ -10,3 +10,15 @@ class CreatedModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+class AtomicSaveModel(models.Model):
+    """Абстрактная модель. Сохраняет запись и выполняет обработчики
+    post_save в одной транзакции."""
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
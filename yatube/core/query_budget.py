@@ -0,0 +1,141 @@
+import logging
+import re
+import sys
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+logger = logging.getLogger('yatube.queries')
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r'\bIN \((?:%s|\?)(?:, (?:%s|\?))*\)')
+# Обёртки execute_wrapper из core, которые не считаются источником запроса.
+_INSTRUMENTATION = ('query_budget.py', 'slow_queries.py', 'timing.py')
+
+
+def query_budget(limit):
+    """Объявляет наибольшее число SQL-запросов на один вызов представления.
+
+    Бюджет читают QueryBudgetMiddleware и pytest-плагин
+    core.query_budget_plugin. Декоратор ставится поверх остальных.
+    """
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+def budget_of(view):
+    return getattr(view, 'query_budget', None)
+
+
+def query_shape(sql):
+    """SQL без значений: запросы одной формы отличаются только параметрами."""
+    return _IN_LISTS.sub('IN (...)', _LITERALS.sub('?', sql))
+
+
+def _template_line(frame):
+    # Самый глубокий узел шаблона на стеке: его render_annotated
+    # держит self с token.lineno и origin.
+    while frame is not None:
+        node = frame.f_locals.get('self')
+        if frame.f_code.co_name == 'render_annotated' and node is not None:
+            origin = getattr(node, 'origin', None)
+            token = getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                return f'{origin.template_name}:{token.lineno}'
+        frame = frame.f_back
+    return None
+
+
+def _code_line(frame):
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if (filename.startswith(settings.BASE_DIR)
+                and 'site-packages' not in filename
+                and not filename.endswith(_INSTRUMENTATION)):
+            return f'{filename}:{frame.f_lineno}'
+        frame = frame.f_back
+    return None
+
+
+def query_source(frame):
+    """Строка шаблона или кода проекта, из которой выполнен запрос."""
+    return _template_line(frame) or _code_line(frame)
+
+
+class QueryLog:
+    """Запросы, выполненные внутри inspect_queries()."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __len__(self):
+        return len(self.queries)
+
+    def __call__(self, execute, sql, params, many, context):
+        frame = sys._getframe(1)
+        self.queries.append((query_shape(sql), query_source(frame)))
+        return execute(sql, params, many, context)
+
+    def repeated(self, threshold=None):
+        """Формы запросов, повторённые не меньше threshold раз (N+1).
+
+        Возвращает список (форма, число повторов, место вызова).
+        """
+        if threshold is None:
+            threshold = settings.QUERY_REPEAT_THRESHOLD
+        counts = Counter(shape for shape, _ in self.queries)
+        sources = Counter(self.queries)
+        return [
+            (shape, count, max(
+                (source for other, source in sources
+                 if other == shape),
+                key=lambda source: sources[shape, source],
+            ))
+            for shape, count in counts.most_common() if count >= threshold
+        ]
+
+
+@contextmanager
+def inspect_queries(using=connection):
+    log = QueryLog()
+    with using.execute_wrapper(log):
+        yield log
+
+
+class QueryBudgetMiddleware:
+    """Отладочная проверка бюджета запросов и поиск N+1.
+
+    Работает только при DEBUG: превышение бюджета и повторяющиеся
+    запросы одной формы пишутся в лог yatube.queries вместе со строкой
+    шаблона, из которой они выполнены.
+    """
+
+    def __init__(self, get_response):
+        if not settings.DEBUG:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with inspect_queries() as log:
+            response = self.get_response(request)
+        self.report(request, log)
+        return response
+
+    def report(self, request, log):
+        match = request.resolver_match
+        budget = match and budget_of(match.func)
+        if budget is not None and len(log) > budget:
+            logger.warning(
+                '%s: %d SQL-запросов при бюджете %d',
+                request.path, len(log), budget,
+            )
+        for shape, count, source in log.repeated():
+            logger.warning(
+                '%s: N+1, запрос повторён %d раз из %s: %s',
+                request.path, count, source, shape,
+            )
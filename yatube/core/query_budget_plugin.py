@@ -0,0 +1,116 @@
+"""pytest-плагин: представления posts.urls укладываются в бюджет запросов.
+
+Тест, запрашивающий фикстуру budget_view, параметризуется всеми
+маршрутами posts.urls и api.urls, для которых объявлен query_budget. Фикстура
+check_query_budget открывает маршрут на наборе данных реалистичного
+размера и падает, если запросов больше бюджета.
+"""
+import pytest
+
+DATASET = {
+    'users': 60,
+    'groups': 5,
+    'posts': 300,
+    'comments_per_post': 8,
+    'follows_per_user': 15,
+}
+
+
+def _budget_patterns():
+    from api import urls as api_urls
+    from posts import urls as posts_urls
+
+    from .query_budget import budget_of
+
+    return [(urls.app_name, pattern)
+            for urls in (posts_urls, api_urls)
+            for pattern in urls.urlpatterns
+            if budget_of(pattern.callback) is not None]
+
+
+def pytest_generate_tests(metafunc):
+    if 'budget_view' in metafunc.fixturenames:
+        patterns = _budget_patterns()
+        metafunc.parametrize(
+            'budget_view', patterns,
+            ids=[f'{namespace}:{p.name}' for namespace, p in patterns]
+        )
+
+
+@pytest.fixture
+def budget_dataset(db):
+    from django.contrib.auth import get_user_model
+
+    from posts.counters import reconcile_counters
+    from posts.feeds import rebuild_timelines
+    from posts.models import Comment, Follow, Group, Post
+
+    User = get_user_model()
+    # SQLite не возвращает pk из bulk_create, поэтому строки
+    # перечитываются из базы.
+    User.objects.bulk_create(
+        [User(username=f'budget_{i}') for i in range(DATASET['users'])]
+    )
+    users = list(User.objects.filter(username__startswith='budget_'))
+    Group.objects.bulk_create(
+        [Group(title=f'Группа {i}', slug=f'budget-{i}',
+               description='Описание') for i in range(DATASET['groups'])]
+    )
+    groups = list(Group.objects.filter(slug__startswith='budget-'))
+    Post.objects.bulk_create(
+        [Post(text=f'Пост {i}', author=users[i % len(users)],
+              group=groups[i % len(groups)])
+         for i in range(DATASET['posts'])]
+    )
+    posts = list(Post.objects.order_by('pk'))
+    Comment.objects.bulk_create(
+        [Comment(text='Комментарий', post=post,
+                 author=users[(post.pk + i) % len(users)])
+         for post in posts for i in range(DATASET['comments_per_post'])]
+    )
+    Follow.objects.bulk_create(
+        [Follow(user=user, author=users[(n + i) % len(users)])
+         for n, user in enumerate(users)
+         for i in range(1, DATASET['follows_per_user'] + 1)]
+    )
+    reconcile_counters()
+    rebuild_timelines()
+    user = users[0]
+    return {
+        'user': user,
+        'group': groups[0],
+        'post': [post for post in posts if post.author_id == user.pk][-1],
+    }
+
+
+@pytest.fixture
+def check_query_budget(budget_dataset, client):
+    from django.core.cache import cache
+    from django.urls import reverse
+
+    from .query_budget import budget_of, inspect_queries
+
+    client.force_login(budget_dataset['user'])
+    values = {
+        'slug': budget_dataset['group'].slug,
+        'username': budget_dataset['user'].username,
+        'post_id': budget_dataset['post'].pk,
+    }
+
+    def check(route):
+        namespace, pattern = route
+        kwargs = {name: values[name] for name in pattern.pattern.converters}
+        url = reverse(f'{namespace}:{pattern.name}', kwargs=kwargs)
+        budget = budget_of(pattern.callback)
+        cache.clear()
+        with inspect_queries() as log:
+            response = client.get(url)
+        assert response.status_code == 200, url
+        repeated = ''.join(
+            f'\n  {count} x {source}: {shape}'
+            for shape, count, source in log.repeated()
+        )
+        assert len(log) <= budget, (
+            f'{url}: {len(log)} SQL-запросов при бюджете {budget}{repeated}'
+        )
+    return check
@@ -0,0 +1,123 @@
+"""Журнал медленных SQL-запросов.
+
+Обёртка record_slow_queries ставится на каждое соединение с базой при
+его создании. Запросы дольше SLOW_QUERY_THRESHOLD_MS пишутся JSON-строкой
+в ротируемый файл SLOW_QUERY_LOG вместе с параметрами, представлением,
+строкой шаблона или кода и планом EXPLAIN.
+"""
+import datetime as dt
+import json
+import logging
+import os
+import sys
+import time
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+
+from django.conf import settings
+from django.db import connections
+
+from .query_budget import query_shape, query_source
+from .timing import current
+
+logger = logging.getLogger('yatube.slow_queries')
+logger.setLevel(logging.INFO)
+logger.propagate = False
+
+_explaining = ContextVar('explaining', default=False)
+PARAM_REPR_LIMIT = 200
+
+
+def _ensure_handler():
+    # Путь к журналу читается из настроек при каждой записи, чтобы его
+    # можно было подменить в тестах.
+    path = os.path.abspath(settings.SLOW_QUERY_LOG)
+    if any(handler.baseFilename == path for handler in logger.handlers):
+        return
+    close_log()
+    logger.addHandler(RotatingFileHandler(
+        path,
+        maxBytes=settings.SLOW_QUERY_LOG_MAX_BYTES,
+        backupCount=settings.SLOW_QUERY_LOG_BACKUPS,
+        encoding='utf-8',
+        delay=True,
+    ))
+
+
+def close_log():
+    """Закрывает файл журнала; следующая запись откроет его заново."""
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+
+
+def _explain(connection, sql, params):
+    if not sql.lstrip().upper().startswith('SELECT'):
+        return None
+    token = _explaining.set(True)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'{connection.ops.explain_query_prefix()} {sql}', params
+            )
+            return [' '.join(map(str, row)) for row in cursor.fetchall()]
+    except Exception as exc:
+        return [f'EXPLAIN не выполнен: {exc}']
+    finally:
+        _explaining.reset(token)
+
+
+def _view_name():
+    timing = current()
+    request = timing and timing.request
+    match = request and request.resolver_match
+    return match.view_name if match else None
+
+
+def record_slow_queries(execute, sql, params, many, context):
+    if _explaining.get():
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    result = execute(sql, params, many, context)
+    elapsed = (time.perf_counter() - started) * 1000
+    if elapsed >= settings.SLOW_QUERY_THRESHOLD_MS:
+        connection = context['connection']
+        _ensure_handler()
+        logger.info(json.dumps({
+            'time': dt.datetime.now().isoformat(timespec='seconds'),
+            'duration_ms': round(elapsed, 3),
+            'database': connection.alias,
+            'sql': sql,
+            'params': [repr(param)[:PARAM_REPR_LIMIT]
+                       for param in (params or ())] if not many else None,
+            'shape': query_shape(sql),
+            'view': _view_name(),
+            'source': query_source(sys._getframe(1)),
+            'plan': None if many else _explain(connection, sql, params),
+        }, ensure_ascii=False))
+    return result
+
+
+def install(sender=None, connection=None, **kwargs):
+    """Ставит запись медленных запросов на соединение (connection_created)."""
+    targets = [connection] if connection is not None else connections.all()
+    for target in targets:
+        # В начало списка: connection.execute_wrapper() снимает обёртку
+        # с конца, а соединение может открыться внутри такого блока.
+        if record_slow_queries not in target.execute_wrappers:
+            target.execute_wrappers.insert(0, record_slow_queries)
+
+
+def read_records(path):
+    """Записи журнала и его ротированных копий, от старых к новым."""
+    paths = [f'{path}.{number}'
+             for number in range(settings.SLOW_QUERY_LOG_BACKUPS, 0, -1)]
+    for name in paths + [path]:
+        if not os.path.exists(name):
+            continue
+        with open(name, encoding='utf-8') as file:
+            for line in file:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
@@ -0,0 +1,91 @@
+"""Хранилище файлов с именами по содержимому.
+
+Файл сохраняется как <каталог upload_to>/ab/cd/<sha256>.<расширение>.
+Вложенные каталоги держат в каждом не больше 256 записей, а одинаковые
+загрузки получают одно имя и хранятся один раз: посты ссылаются на
+общий файл. Поэтому файл удаляют, только когда на него больше не
+ссылается ни один пост. Содержимое по такому имени никогда не
+меняется, и его можно отдавать с бессрочным кешированием.
+
+Загрузки из запроса (UploadedFile) ещё не обработаны и могут содержать
+метаданные вроде GPS, поэтому они кладутся в закрытый каталог
+incoming/, который не отдают ни Django, ни веб-сервер. Опубликованную
+копию записывает уже обработчик загрузки.
+"""
+import hashlib
+import os
+import posixpath
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import UploadedFile
+from django.utils.deconstruct import deconstructible
+
+CONTENT_NAME = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.\w+$')
+STAGING_PREFIX = 'incoming/'
+
+
+def is_content_addressed(name):
+    """Имя выдано ContentAddressedStorage, и содержимое за ним неизменно."""
+    return bool(CONTENT_NAME.search(name))
+
+
+def is_staged(name):
+    """Файл лежит в закрытом каталоге необработанных загрузок."""
+    return name.startswith(STAGING_PREFIX)
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage, называющий файлы по sha256 содержимого."""
+
+    shard_depth = 2
+    shard_width = 2
+
+    def content_name(self, name, content, staged=False):
+        """Имя для content в каталоге из name, с расширением из name."""
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        shards = [digest[index:index + self.shard_width] for index in range(
+            0, self.shard_depth * self.shard_width, self.shard_width
+        )]
+        name = name.replace('\\', '/')
+        if is_staged(name):
+            name = name[len(STAGING_PREFIX):]
+        extension = posixpath.splitext(name)[1].lower()
+        if is_content_addressed(name):
+            # Пересохраняемый файл уже лежит в каталогах по хешу.
+            directory = CONTENT_NAME.sub('', name)
+        else:
+            directory = posixpath.dirname(name)
+        if staged:
+            directory = posixpath.join(STAGING_PREFIX, directory)
+        return posixpath.join(directory, *shards, digest + extension)
+
+    def get_available_name(self, name, max_length=None):
+        # Имя задано содержимым: файл с суффиксом был бы копией, которую
+        # не найдёт дедупликация. Занятое имя значит, что тот же файл
+        # уже сохранён, в том числе параллельным запросом.
+        if self.exists(name):
+            raise FileExistsError(name)
+        return name
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(
+            name, content, staged=isinstance(content, UploadedFile)
+        )
+        try:
+            return super().save(name, content, max_length)
+        except FileExistsError:
+            # Такой файл уже загружали: ссылаемся на него же. Время
+            # изменения обновляем, чтобы отложенное удаление видело,
+            # что файл снова понадобился.
+            os.utime(self.path(name))
+            return name
@@ -0,0 +1,44 @@
+from django import template
+
+register = template.Library()
+
+
+def _elided_range(number, last, on_each_side, on_ends, known_last=True):
+    """Номера страниц вокруг текущей; None обозначает пропуск.
+
+    Диапазон не материализуется целиком, поэтому размер навигации
+    не зависит от числа страниц.
+    """
+    if number > 1 + on_each_side + on_ends + 1:
+        yield from range(1, on_ends + 1)
+        yield None
+        yield from range(number - on_each_side, number + 1)
+    else:
+        yield from range(1, number + 1)
+    if known_last and number < last - on_each_side - on_ends - 1:
+        yield from range(number + 1, number + on_each_side + 1)
+        yield None
+        yield from range(last - on_ends + 1, last + 1)
+    else:
+        yield from range(number + 1, last + 1)
+
+
+@register.simple_tag
+def page_window(page_obj, on_each_side=2, on_ends=1):
+    """Окно навигации для обычной и курсорной страницы.
+
+    У курсорной страницы число страниц неизвестно, поэтому справа
+    показывается только следующая страница. Если курсорная страница
+    открыта по ключу, а не по номеру, окна нет совсем.
+    """
+    number = page_obj.number
+    if number is None:
+        return []
+    if getattr(page_obj, 'is_cursor', False):
+        last = number + 1 if page_obj.has_next() else number
+        return list(_elided_range(
+            number, last, on_each_side, on_ends, known_last=False
+        ))
+    return list(_elided_range(
+        number, page_obj.paginator.num_pages, on_each_side, on_ends
+    ))
@@ -0,0 +1,70 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+from PIL import Image
+
+from posts.thumbnails import (
+    attach_thumbnails, cached_renditions, cached_thumbnail
+)
+
+# Формат, который понимают все браузеры: его копии идут в srcset
+# самого <img>, остальные форматы — в <source> перед ним.
+FALLBACK_FORMAT = 'JPEG'
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(post, size):
+    """Готовая миниатюра картинки поста или None.
+
+    Миниатюра здесь не генерируется: пока фоновая генерация не
+    закончилась, шаблон показывает заглушку.
+    """
+    if not post.image:
+        return None
+    thumbnails = getattr(post, 'thumbnails', {})
+    if size in thumbnails:
+        return thumbnails[size]
+    return cached_thumbnail(post.image, size)
+
+
+def _srcset(files):
+    return ', '.join(f'{file.url} {file.width}w' for file in files)
+
+
+@register.simple_tag
+def post_picture(post, size, css_class='card-img my-2'):
+    """<picture> с копиями миниатюры в srcset или '', пока её нет.
+
+    Браузер скачивает самую узкую копию, которой хватает по sizes.
+    Явные width и height резервируют место под картинку до загрузки.
+    """
+    thumbnail = post_thumbnail(post, size)
+    if thumbnail is None:
+        return ''
+    sources = getattr(post, 'renditions', {}).get(size)
+    if sources is None:
+        sources = cached_renditions(post.image, size)
+    sizes = f'(max-width: {thumbnail.width}px) 100vw, {thumbnail.width}px'
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" width="{}" '
+        'height="{}" loading="lazy" decoding="async" class="{}" alt="">'
+        '</picture>',
+        format_html_join('', '<source type="{}" srcset="{}" sizes="{}">', (
+            (Image.MIME[name], _srcset(files), sizes)
+            for name, files in sources.items() if name != FALLBACK_FORMAT
+        )),
+        thumbnail.url,
+        _srcset(sources.get(FALLBACK_FORMAT) or [thumbnail]),
+        sizes, thumbnail.width, thumbnail.height, css_class,
+    )
+
+
+@register.filter
+def with_thumbnails(posts, size):
+    """Посты страницы с заранее найденными миниатюрами size.
+
+    {% for post in page_obj|with_thumbnails:'card' %} находит миниатюры
+    всей страницы одним обращением к кешу вместо поштучного.
+    """
+    return attach_thumbnails(posts, size)
@@ -0,0 +1,238 @@
+import json
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connection
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import (
+    DjangoTemplates, Template, reraise
+)
+
+from . import metrics
+
+logger = logging.getLogger('yatube.timing')
+
+_current = ContextVar('request_timing', default=None)
+_in_cache_call = ContextVar('in_cache_call', default=False)
+_MISSING = object()
+
+
+def current():
+    """Замеры запроса, который сейчас обрабатывается, или None."""
+    return _current.get()
+
+
+class RequestTiming:
+    """Куда уходит время одного запроса."""
+
+    def __init__(self, request=None):
+        self.request = request
+        self.started = time.perf_counter()
+        self.db = 0.0
+        self.queries = 0
+        self.templates = 0.0
+        self.cache = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_sets = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - started
+            self.queries += 1
+
+    @property
+    def total(self):
+        return time.perf_counter() - self.started
+
+    def header(self):
+        return ', '.join([
+            f'db;dur={self.db * 1000:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.templates * 1000:.1f}',
+            f'cache;dur={self.cache * 1000:.1f};desc="hits={self.cache_hits} '
+            f'misses={self.cache_misses} sets={self.cache_sets}"',
+            f'total;dur={self.total * 1000:.1f}',
+        ])
+
+    def as_dict(self):
+        return {
+            'total_ms': round(self.total * 1000, 1),
+            'db_ms': round(self.db * 1000, 1),
+            'queries': self.queries,
+            'template_ms': round(self.templates * 1000, 1),
+            'cache_ms': round(self.cache * 1000, 1),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'cache_sets': self.cache_sets,
+        }
+
+
+class ServerTimingMiddleware:
+    """Замеры каждого запроса в заголовке Server-Timing и в логе.
+
+    Время SQL считается через connection.execute_wrapper, шаблонов —
+    в TimedDjangoTemplates, обращения к кешу — в InstrumentedCacheMixin.
+    В лог yatube.timing попадает доля запросов TIMING_LOG_SAMPLE_RATE.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timing = RequestTiming(request)
+        token = _current.set(timing)
+        try:
+            with connection.execute_wrapper(timing):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        response['Server-Timing'] = timing.header()
+        match = request.resolver_match
+        view = match.view_name if match else None
+        metrics.observe_request(view or 'unresolved', timing.total,
+                                timing.queries)
+        if random.random() < settings.TIMING_LOG_SAMPLE_RATE:
+            logger.info(json.dumps({
+                'view': view,
+                'method': request.method,
+                'status': response.status_code,
+                **timing.as_dict(),
+            }))
+        return response
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        timing = _current.get()
+        if timing is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timing.templates += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Шаблонизатор Django, замеряющий рендеринг страниц целиком.
+
+    Вложенные include рендерятся внутри движка и отдельно не считаются.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(
+                self.engine.get_template(template_name), self
+            )
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+class InstrumentedCacheMixin:
+    """Замеряет чтения и записи кеша в запросе и считает их в метриках.
+
+    Базовые get_many и set_many вызывают get и set по ключу, поэтому
+    считается только внешний вызов: вложенные идут в него же.
+    Алиас для метрик задаётся ключом ALIAS в OPTIONS кеша.
+    """
+
+    def __init__(self, location, params):
+        options = dict(params.get('OPTIONS', {}))
+        self.alias = options.pop('ALIAS', 'default')
+        super().__init__(location, {**params, 'OPTIONS': options})
+
+    @contextmanager
+    def _measure(self):
+        """Замеряет вызов; отдаёт True, если он не вложен в другой."""
+        if _in_cache_call.get():
+            yield False
+            return
+        token = _in_cache_call.set(True)
+        started = time.perf_counter()
+        try:
+            yield True
+        finally:
+            _in_cache_call.reset(token)
+            timing = _current.get()
+            if timing is not None:
+                timing.cache += time.perf_counter() - started
+
+    def _record(self, hits=0, misses=0, sets=0):
+        for result, amount in (('hit', hits), ('miss', misses),
+                               ('set', sets)):
+            if amount:
+                metrics.CACHE_REQUESTS.inc(
+                    amount, alias=self.alias, result=result
+                )
+        timing = _current.get()
+        if timing is not None:
+            timing.cache_hits += hits
+            timing.cache_misses += misses
+            timing.cache_sets += sets
+
+    def get(self, key, default=None, version=None):
+        with self._measure() as outer:
+            value = super().get(key, _MISSING, version)
+        hit = value is not _MISSING
+        if outer:
+            self._record(hits=int(hit), misses=int(not hit))
+        return value if hit else default
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        with self._measure() as outer:
+            found = super().get_many(keys, version)
+        if outer:
+            self._record(hits=len(found), misses=len(keys) - len(found))
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._measure() as outer:
+            super().set(key, value, timeout, version)
+        if outer:
+            self._record(sets=1)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._measure() as outer:
+            failed = super().set_many(data, timeout, version)
+        if outer:
+            self._record(sets=len(data) - len(failed))
+        return failed
+
+
+class InstrumentedFileBasedCache(InstrumentedCacheMixin, FileBasedCache):
+    """Кеш в файлах, проверяющий MAX_ENTRIES не при каждой записи.
+
+    FileBasedCache перед каждой записью читает весь каталог, чтобы
+    сравнить число файлов с MAX_ENTRIES. Здесь каталог читается не чаще
+    раза в cull_interval секунд на процесс, и запись стоит O(1).
+    """
+
+    cull_interval = 60
+    # Каталог кеша -> time.monotonic() последней проверки в процессе.
+    _culled = {}
+
+    def _cull(self):
+        now = time.monotonic()
+        last = self._culled.get(self._dir)
+        if last is not None and now - last < self.cull_interval:
+            return
+        self._culled[self._dir] = now
+        super()._cull()
+
+
+class InstrumentedLocMemCache(InstrumentedCacheMixin, LocMemCache):
+    pass
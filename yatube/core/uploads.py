@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+
+
+class CappedTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загрузку во временный файл по частям, не больше лимита.
+
+    Файл любого размера идёт на диск, а не в память. Данные сверх
+    FILE_UPLOAD_MAX_SIZE отбрасываются, но size файла остаётся полным,
+    чтобы форма могла отклонить его по размеру.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received <= settings.FILE_UPLOAD_MAX_SIZE:
+            return super().receive_data_chunk(raw_data, start)
+        return None
@@ -1,4 +1,14 @@
+import hmac
+import posixpath
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
+from django.utils.cache import patch_cache_control
+from django.views.static import serve
+
+from .metrics import registry
+from .storage import is_content_addressed, is_staged
 
 
 def page_not_found(request, exception):
@@ -15,3 +25,43 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def _metrics_allowed(request):
+    # Адрес клиента ничего не доказывает: за прокси все запросы
+    # приходят с 127.0.0.1.
+    if request.user.is_staff:
+        return True
+    scheme, _, token = request.META.get('HTTP_AUTHORIZATION', '').partition(
+        ' '
+    )
+    return bool(settings.METRICS_TOKEN) and scheme == 'Bearer' and (
+        hmac.compare_digest(token, settings.METRICS_TOKEN)
+    )
+
+
+def metrics(request):
+    """Метрики всех процессов в формате Prometheus, только для своих."""
+    if not _metrics_allowed(request):
+        raise Http404
+    return HttpResponse(
+        registry.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
+
+
+def media(request, path):
+    """Отдаёт MEDIA_ROOT; файлы с именами по содержимому — навсегда.
+
+    Необработанные загрузки из incoming/ наружу не отдаются. Путь
+    проверяется после нормализации: иначе //incoming/ или
+    posts/../incoming/ обошли бы проверку.
+    """
+    path = posixpath.normpath(path).lstrip('/')
+    if is_staged(path):
+        raise Http404
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    if is_content_addressed(path):
+        patch_cache_control(response, public=True, immutable=True,
+                            max_age=settings.MEDIA_IMMUTABLE_MAX_AGE)
+    return response
@@ -1,6 +1,9 @@
 from django.contrib import admin
+from django.db import models
 
 from .models import Post, Group
+from .search import filter_posts
+from .uploads import validate_image_upload
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -15,6 +18,15 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     list_editable = ('group',)
     empty_value_display = '-пусто-'
+    formfield_overrides = {
+        models.ImageField: {'validators': [validate_image_upload]},
+    }
+
+    def get_search_results(self, request, queryset, search_term):
+        # Вместо LIKE '%...%' по всей таблице ищем по индексу FTS5.
+        if not search_term.strip():
+            return queryset, False
+        return filter_posts(queryset, search_term), False
 
 
 admin.site.register(Post, PostAdmin)
@@ -0,0 +1,212 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .models import Group, Post, User
+from .utils import decode_cursor, encode_position
+
+FEED_VERSION_KEY = 'feed_version:{}'
+GLOBAL_GENERATION_KEY = 'generation:posts'
+GROUP_GENERATION_KEY = 'generation:group:{}'
+AUTHOR_GENERATION_KEY = 'generation:author:{}'
+POST_GENERATION_KEY = 'generation:post:{}'
+
+
+def _new_version():
+    # Версия должна отличаться от любой прежней, даже если ключ
+    # вытеснили из кеша, поэтому берём время, а не счётчик с единицы.
+    return time.time_ns()
+
+
+def versions(keys):
+    found = cache.get_many(keys)
+    missing = {key: _new_version() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return [found[key] for key in keys]
+
+
+def _bump(keys):
+    version = _new_version()
+    cache.set_many({key: version for key in keys}, None)
+
+
+def generation(*keys):
+    """Поколение набора данных для ключа кеша страницы или фрагмента.
+
+    Например, generation(GROUP_GENERATION_KEY.format(group.pk)).
+    """
+    return '.'.join(map(str, versions(list(keys))))
+
+
+def _post_keys(post, previous_group_id=None):
+    keys = {
+        GLOBAL_GENERATION_KEY,
+        AUTHOR_GENERATION_KEY.format(post.author_id),
+        POST_GENERATION_KEY.format(post.pk),
+    }
+    for group_id in (post.group_id, previous_group_id):
+        if group_id is not None:
+            keys.add(GROUP_GENERATION_KEY.format(group_id))
+    return keys
+
+
+def bump_post_generations(post, previous_group_id=None):
+    """Сбрасывает кеш лент, в которые попадает пост."""
+    _bump(_post_keys(post, previous_group_id))
+
+
+def bump_comment_generations(comment):
+    _bump([POST_GENERATION_KEY.format(comment.post_id)])
+
+
+def bump_batch_generations(posts=(), commented_post_ids=()):
+    """Сбрасывает кеш для пачки новых постов и комментариев разом."""
+    keys = set()
+    for post in posts:
+        keys |= _post_keys(post)
+    keys.update(POST_GENERATION_KEY.format(pk) for pk in commented_post_ids)
+    if keys:
+        _bump(keys)
+
+
+def bump_author_generation(author_id):
+    """Сбрасывает кеш страниц и лент подписок с постами автора."""
+    _bump([AUTHOR_GENERATION_KEY.format(author_id)])
+
+
+def bump_feed_versions(user_ids):
+    """Сбрасывает закешированные ленты подписок пользователей."""
+    _bump([FEED_VERSION_KEY.format(pk) for pk in user_ids])
+
+
+def feed_version(user, author_ids):
+    """Версия ленты подписок пользователя для ключа кеша и ETag.
+
+    В неё входят поколения всех авторов из подписок: пост автора
+    сбрасывает его поколение, поэтому при публикации не нужно обходить
+    подписчиков, а чтение стоит одного get_many.
+    """
+    tag = generation(FEED_VERSION_KEY.format(user.pk), *[
+        AUTHOR_GENERATION_KEY.format(pk) for pk in sorted(author_ids)
+    ])
+    return hashlib.md5(tag.encode()).hexdigest()
+
+
+def index_generation_keys():
+    return [GLOBAL_GENERATION_KEY]
+
+
+def group_generation_keys(slug):
+    group_id = Group.objects.filter(
+        slug=slug
+    ).values_list('pk', flat=True).first()
+    if group_id is None:
+        return None
+    return [GROUP_GENERATION_KEY.format(group_id)]
+
+
+def profile_generation_keys(username):
+    author_id = User.objects.filter(
+        username=username
+    ).values_list('pk', flat=True).first()
+    if author_id is None:
+        return None
+    return [AUTHOR_GENERATION_KEY.format(author_id)]
+
+
+def post_generation_keys(post_id):
+    author_id = Post.objects.filter(
+        pk=post_id
+    ).values_list('author_id', flat=True).first()
+    if author_id is None:
+        return None
+    return [POST_GENERATION_KEY.format(post_id),
+            AUTHOR_GENERATION_KEY.format(author_id)]
+
+
+def conditional_page(generation_keys, vary_on=None):
+    """Условный GET и кеш целой страницы для анонимных читателей.
+
+    generation_keys получает аргументы представления и возвращает
+    ключи поколений, от которых зависит страница, или None, если
+    объекта нет. ETag и Last-Modified вычисляются по поколениям без
+    рендеринга; анонимным читателям готовая страница отдаётся из кеша,
+    авторизованные получают её персональный вариант. Для них в ETag
+    входит версия ленты подписок: она меняется при подписке и отписке.
+    Кроме позиции страницы, анонимная копия зависит только от строки
+    vary_on(request), если она задана, например от выбранных полей API.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            keys = generation_keys(*args, **kwargs)
+            if request.method != 'GET' or keys is None:
+                return view(request, *args, **kwargs)
+            if request.user.is_authenticated:
+                keys.append(FEED_VERSION_KEY.format(request.user.pk))
+            values = versions(keys)
+            tag = '.'.join(map(str, values))
+            etag = quote_etag(hashlib.md5(
+                f'{tag}:{request.user.pk}'.encode()
+            ).hexdigest())
+            last_modified = max(values) // 10 ** 9
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is None:
+                response = _anonymous_page(request, tag, view, args, kwargs,
+                                           vary_on)
+            if response.status_code in (200, 304):
+                response['ETag'] = etag
+                response['Last-Modified'] = http_date(last_modified)
+                patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
+
+
+def _page_position(request):
+    """Позиция страницы из page, after и before в каноническом виде.
+
+    Другие параметры в ключ кеша не входят, а курсоры и номер
+    страницы перекодируются: иначе ?x=1, ?x=2… плодили бы копии одной
+    страницы и вытесняли из кеша полезные записи. Порядок разбора тот
+    же, что у CursorPaginator.get_cursor_page().
+    """
+    for name in ('after', 'before'):
+        cursor = decode_cursor(request.GET.get(name))
+        if cursor is not None:
+            return f'{name}={encode_position(*cursor)}'
+    try:
+        number = max(int(request.GET.get('page')), 1)
+    except (TypeError, ValueError):
+        number = 1
+    return f'page={number}'
+
+
+def _anonymous_page(request, tag, view, args, kwargs, vary_on=None):
+    if request.user.is_authenticated:
+        return view(request, *args, **kwargs)
+    variant = f'{request.path}?{_page_position(request)}'
+    if vary_on is not None:
+        variant += f'&{vary_on(request)}'
+    key = 'page:{}:{}'.format(
+        hashlib.md5(variant.encode()).hexdigest(), tag
+    )
+    cached = cache.get(key)
+    if cached is not None:
+        content, content_type = cached
+        return HttpResponse(content, content_type=content_type)
+    response = view(request, *args, **kwargs)
+    if response.status_code == 200 and not response.cookies:
+        cache.set(key, (response.content, response['Content-Type']),
+                  settings.PAGE_CACHE_TIMEOUT)
+    return response
@@ -0,0 +1,25 @@
+from django.core.checks import Tags, Warning, register
+from django.db import connection
+
+from .search import FTS_TABLE, FTS_TRIGGERS, fts_available, fts_triggers
+
+
+@register(Tags.database)
+def check_search_triggers(app_configs, **kwargs):
+    """Триггеры поискового индекса на месте.
+
+    Миграция, пересоздающая таблицу постов на SQLite (например,
+    AlterField), удаляет её триггеры, и индекс молча устаревает.
+    """
+    if not fts_available() or FTS_TABLE not in (
+            connection.introspection.table_names()):
+        return []
+    missing = sorted(set(FTS_TRIGGERS) - set(fts_triggers()))
+    if not missing:
+        return []
+    return [Warning(
+        f'Нет триггеров поискового индекса: {", ".join(missing)}.',
+        hint='Пересоздайте их миграцией по образцу 0010_post_fts и '
+             'выполните manage.py rebuild_search_index.',
+        id='posts.W001',
+    )]
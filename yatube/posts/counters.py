@@ -0,0 +1,132 @@
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, User, UserCounters
+
+
+def _count(model, field, outer='pk'):
+    """Подзапрос «число строк model, где field ссылается на outer»."""
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef(outer)}).order_by().values(
+            field
+        ).annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def actual_user_counts(outer='pk'):
+    """Аннотации с пересчитанными по таблицам счётчиками пользователя.
+
+    outer — поле с id пользователя у аннотируемой модели.
+    """
+    return {
+        'actual_posts': _count(Post, 'author', outer),
+        'actual_followers': _count(Follow, 'author', outer),
+        'actual_following': _count(Follow, 'user', outer),
+    }
+
+
+def actual_comments_count(outer='pk'):
+    """Выражение с пересчитанным числом комментариев поста."""
+    return _count(Comment, 'post', outer)
+
+
+def change_user_counters(user_id, **deltas):
+    """Атомарно меняет счётчики пользователя на заданные приращения.
+
+    Если строки счётчиков ещё нет, она будет посчитана целиком
+    при первом чтении в user_counters().
+    """
+    UserCounters.objects.filter(user_id=user_id).update(**{
+        field: F(field) + delta for field, delta in deltas.items()
+    })
+
+
+def change_comments_count(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=F('comments_count') + delta
+    )
+
+
+def change_many_user_counters(user_ids, **deltas):
+    """change_user_counters для нескольких пользователей одним UPDATE."""
+    UserCounters.objects.filter(user_id__in=user_ids).update(**{
+        field: F(field) + delta for field, delta in deltas.items()
+    })
+
+
+def change_followers_counts(author_ids, delta):
+    """Меняет число подписчиков авторов, возвращает {id: (было, стало)}.
+
+    Изменение и чтение идут в одной транзакции, поэтому между ними
+    не вклинится другой писатель и переход через порог
+    «знаменитости» увидит ровно один из них. У автора без строки
+    счётчиков (её посчитает user_counters()) пара — (0, 0).
+    """
+    with transaction.atomic():
+        change_many_user_counters(author_ids, followers_count=delta)
+        after = dict(UserCounters.objects.filter(
+            user_id__in=author_ids
+        ).values_list('user_id', 'followers_count'))
+    return {author_id: (after[author_id] - delta, after[author_id])
+            if author_id in after else (0, 0) for author_id in author_ids}
+
+
+def add_comments_counts(counts):
+    """Прибавляет к счётчикам постов {post_id: число новых комментариев}.
+
+    Посты с одинаковым приращением обновляются одним UPDATE.
+    """
+    by_delta = {}
+    for post_id, delta in counts.items():
+        by_delta.setdefault(delta, []).append(post_id)
+    for delta, post_ids in by_delta.items():
+        Post.objects.filter(pk__in=post_ids).update(
+            comments_count=F('comments_count') + delta
+        )
+
+
+def reconcile_user(user_id):
+    """Пересчитывает счётчики одного пользователя по таблицам."""
+    user = User.objects.annotate(**actual_user_counts()).get(pk=user_id)
+    counters, _ = UserCounters.objects.update_or_create(
+        user_id=user_id,
+        defaults={
+            'posts_count': user.actual_posts,
+            'followers_count': user.actual_followers,
+            'following_count': user.actual_following,
+        },
+    )
+    return counters
+
+
+def user_counters(user):
+    """Счётчики пользователя; недостающая строка создаётся пересчётом."""
+    try:
+        return user.counters
+    except UserCounters.DoesNotExist:
+        return reconcile_user(user.pk)
+
+
+@transaction.atomic
+def reconcile_counters():
+    """Исправляет расхождения счётчиков. Возвращает число исправленных."""
+    UserCounters.objects.bulk_create(
+        [UserCounters(user_id=pk) for pk in User.objects.filter(
+            counters__isnull=True).values_list('pk', flat=True)],
+        ignore_conflicts=True,
+    )
+    user_counts = actual_user_counts(outer='user_id')
+    drifted_users = UserCounters.objects.annotate(**user_counts).filter(
+        ~Q(posts_count=F('actual_posts'))
+        | ~Q(followers_count=F('actual_followers'))
+        | ~Q(following_count=F('actual_following'))
+    ).values_list('pk', flat=True)
+    fixed = 0
+    for user_id in list(drifted_users):
+        reconcile_user(user_id)
+        fixed += 1
+    fixed += Post.objects.exclude(
+        comments_count=actual_comments_count()
+    ).update(comments_count=actual_comments_count())
+    return fixed
@@ -0,0 +1,250 @@
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+
+from tasks.queue import enqueue
+
+from .models import Follow, Post, TimelineEntry, UserCounters
+from .utils import cursor_source, merge_sources
+
+BATCH_SIZE = 1000
+
+
+def _entries(user_ids, posts):
+    return [
+        TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for user_id in user_ids
+        for post_id, pub_date in posts
+    ]
+
+
+def followers_count(author_id):
+    # Строку счётчиков здесь не пересоздаём: сигналы удаления постов
+    # и подписок приходят и при каскадном удалении самого автора.
+    return UserCounters.objects.filter(user_id=author_id).values_list(
+        'followers_count', flat=True
+    ).first() or 0
+
+
+def _celebrity(followers):
+    return followers >= settings.FEED_CELEBRITY_FOLLOWERS
+
+
+def is_celebrity(author_id):
+    """Авторов с большим числом подписчиков не рассылают по лентам."""
+    return _celebrity(followers_count(author_id))
+
+
+def became_celebrity(followers):
+    """Пересёк ли автор порог «знаменитости» вверх.
+
+    followers — пара (было, стало) из counters.change_followers_counts.
+    """
+    before, after = followers
+    return _celebrity(after) and not _celebrity(before)
+
+
+def celebrity_ids(user):
+    """Авторы из подписок пользователя, чьи посты читаются при запросе."""
+    return followed_authors(user)[1]
+
+
+def followed_authors(user):
+    """Авторы из подписок пользователя и те из них, кто «знаменитость».
+
+    Одним запросом: по всем авторам строится версия ленты
+    (caching.feed_version), посты «знаменитостей» читаются при запросе.
+    """
+    authors, celebrities = set(), set()
+    for author_id, followers in Follow.objects.filter(user=user).values_list(
+            'author_id', 'author__counters__followers_count'):
+        authors.add(author_id)
+        if _celebrity(followers or 0):
+            celebrities.add(author_id)
+    return authors, celebrities
+
+
+def fan_out_post(post):
+    """Добавляет новый пост в ленты всех подписчиков автора."""
+    if is_celebrity(post.author_id):
+        return
+    follower_ids = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        _entries(follower_ids, [(post.pk, post.pub_date)]),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def fan_out_posts(author_id, posts):
+    """fan_out_post для нескольких новых постов одного автора."""
+    if not posts or is_celebrity(author_id):
+        return
+    follower_ids = list(Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True))
+    TimelineEntry.objects.bulk_create(
+        _entries(follower_ids, [(post.pk, post.pub_date) for post in posts]),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill_timelines(user_id, followers):
+    """backfill_timeline для нескольких новых подписок пользователя.
+
+    followers — {id автора: (было, стало)} подписчиков.
+    """
+    drop_celebrity_entries([
+        author_id for author_id, counts in followers.items()
+        if became_celebrity(counts)
+    ])
+    author_ids = [author_id for author_id, (_, after) in followers.items()
+                  if not _celebrity(after)]
+    if not author_ids:
+        return
+    posts = Post.objects.filter(
+        author_id__in=author_ids
+    ).values_list('pk', 'pub_date')
+    TimelineEntry.objects.bulk_create(
+        _entries([user_id], posts.iterator()),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def _backfill(user_id, author_id):
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('pk', 'pub_date')
+    TimelineEntry.objects.bulk_create(
+        _entries([user_id], posts.iterator()),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def drop_celebrity_entries(author_ids):
+    """Чистит ленты от постов авторов, только что ставших «знаменитостями».
+
+    Их посты теперь читаются при запросе, а записи TimelineEntry
+    остались бы лишними строками во всех лентах подписчиков.
+    """
+    if author_ids:
+        TimelineEntry.objects.filter(post__author_id__in=author_ids).delete()
+
+
+def backfill_timeline(user_id, author_id, followers):
+    """Переносит в ленту пользователя все посты нового автора.
+
+    followers — число подписчиков автора (было, стало) после этой
+    подписки.
+    """
+    if not _celebrity(followers[1]):
+        _backfill(user_id, author_id)
+    elif became_celebrity(followers):
+        drop_celebrity_entries([author_id])
+
+
+def prune_timeline(user_id, author_id, followers):
+    """Убирает из ленты пользователя посты автора после отписки.
+
+    followers — число подписчиков автора (было, стало) после отписки.
+    """
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+    before, after = followers
+    if _celebrity(before) and not _celebrity(after):
+        # Автор перестал быть «знаменитостью»: его посты, которые
+        # читались при запросе, разносятся по лентам в очереди, а не
+        # по backfill на каждого из тысяч подписчиков в этом запросе.
+        enqueue('posts.backfill_followers', args=[author_id])
+
+
+def backfill_followers(author_id):
+    """Разносит посты автора по лентам всех его подписчиков."""
+    if is_celebrity(author_id):
+        # Пока задача ждала, автор снова набрал подписчиков.
+        return
+    for follower_id in Follow.objects.filter(
+            author_id=author_id).values_list('user_id', flat=True):
+        _backfill(follower_id, author_id)
+
+
+def timeline_posts(user):
+    """Посты ленты подписок в порядке индекса (user, -pub_date)."""
+    return Post.objects.select_related('author', 'group').filter(
+        timeline_entries__user=user
+    ).order_by(
+        '-timeline_entries__pub_date', '-timeline_entries__post__id'
+    )
+
+
+def follow_sources(user, celebrities):
+    """Источники ленты подписок для posts.utils.seek().
+
+    Посты обычных авторов берутся из TimelineEntry пользователя, посты
+    «знаменитостей» — из их собственных списков.
+    """
+    posts = Post.objects.select_related('author', 'group')
+    sources = [cursor_source(
+        posts.exclude(author_id__in=celebrities),
+        date='timeline_entries__pub_date', pk='timeline_entries__post__id',
+        where={'timeline_entries__user': user},
+    )]
+    sources += [cursor_source(posts.filter(author_id=author_id))
+                for author_id in sorted(celebrities)]
+    return sources
+
+
+class HybridFeed:
+    """Лента подписок: материализованная часть плюс посты «знаменитостей».
+
+    Страницу собирает CursorPaginator: из каждого источника
+    follow_sources() он берёт не больше страницы после курсора
+    (дата, id) и сливает их k-way слиянием при первом обращении к
+    записям. Срезы нужны только для старых ссылок ?page=N.
+    """
+
+    def __init__(self, user, celebrities):
+        self.sources = follow_sources(user, celebrities)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return next(iter(self[index:index + 1]))
+        return islice(
+            merge_sources(self.sources, None, index.stop),
+            index.start, index.stop,
+        )
+
+
+def follow_feed(user, celebrities=None):
+    """Лента подписок пользователя для follow_index.
+
+    Всегда листается по курсору, даже без «знаменитостей»: обычный
+    Paginator сделал бы COUNT(*) и OFFSET по всей ленте.
+    """
+    if celebrities is None:
+        celebrities = celebrity_ids(user)
+    return HybridFeed(user, celebrities)
+
+
+@transaction.atomic
+def rebuild_timelines():
+    """Пересобирает все ленты по таблице Follow. Возвращает число записей."""
+    TimelineEntry.objects.all().delete()
+    celebrities = Follow.objects.values('author_id').annotate(
+        followers=Count('id')
+    ).filter(
+        followers__gte=settings.FEED_CELEBRITY_FOLLOWERS
+    ).values('author_id')
+    for user_id, author_id in Follow.objects.exclude(
+            author_id__in=celebrities).values_list(
+            'user_id', 'author_id').iterator():
+        _backfill(user_id, author_id)
+    return TimelineEntry.objects.count()
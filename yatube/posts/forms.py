@@ -1,12 +1,22 @@
 from django import forms
 
 from .models import Post, Comment
+from .uploads import validate_image_upload, validate_upload_size
 
 
 class PostForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields['group'].empty_label = "Группа не выбрана"
+        field = self.fields['image']
+        to_python = field.to_python
+
+        def sized_to_python(data):
+            if data:
+                validate_upload_size(data)
+            return to_python(data)
+        field.to_python = sized_to_python
+        field.validators.append(validate_image_upload)
 
     class Meta:
         model = Post
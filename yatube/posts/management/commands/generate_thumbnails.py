@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from posts.caching import bump_post_generations
+from posts.models import Post
+from posts.thumbnails import generate_thumbnails
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерирует недостающие миниатюры всех размеров для картинок '
+        'уже опубликованных постов.'
+    )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').only(
+            'pk', 'image', 'author_id', 'group_id'
+        )
+        done = failed = 0
+        for post in posts.iterator():
+            try:
+                generate_thumbnails(post.image)
+            except Exception as exc:
+                failed += 1
+                self.stderr.write(f'Пост {post.pk}: {exc}')
+                continue
+            bump_post_generations(post)
+            done += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Миниатюры готовы для постов: {done}, ошибок: {failed}'
+        ))
@@ -0,0 +1,81 @@
+from django.core.management.base import BaseCommand
+
+from core.storage import is_content_addressed, is_staged
+from posts.caching import bump_batch_generations
+from posts.models import Post
+from posts.uploads import schedule_processing
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит картинки постов, загруженные до хранилища с именами '
+        'по содержимому, в каталоги вида posts/ab/cd/<sha256>.jpg. '
+        'Старые файлы остаются: закешированные страницы ещё ссылаются на '
+        'них. Когда кеш страниц устареет (PAGE_CACHE_TIMEOUT), удалите '
+        'их повторным запуском с --delete-old.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, какие файлы будут перенесены.',
+        )
+        parser.add_argument(
+            '--delete-old', action='store_true',
+            help='Удалить старые файлы, на которые не ссылается ни один пост.',
+        )
+
+    def handle(self, *args, dry_run=False, delete_old=False, **options):
+        storage = Post._meta.get_field('image').storage
+        if delete_old:
+            self.delete_old(storage, dry_run)
+            return
+        names = Post.objects.exclude(image='').order_by().values_list(
+            'image', flat=True
+        ).distinct()
+        moved = missing = 0
+        for name in list(names):
+            if is_content_addressed(name) or is_staged(name):
+                continue
+            if not storage.exists(name):
+                missing += 1
+                self.stderr.write(f'Нет файла {name}')
+                continue
+            if dry_run:
+                self.stdout.write(name)
+                moved += 1
+                continue
+            with storage.open(name) as content:
+                new_name = storage.save(name, content)
+            Post.objects.filter(image=name).update(image=new_name)
+            posts = list(Post.objects.filter(image=new_name).only(
+                'pk', 'image', 'author_id', 'group_id'
+            ))
+            for post in posts:
+                schedule_processing(post)
+            bump_batch_generations(posts)
+            moved += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено файлов: {moved}, не найдено: {missing}'
+        ))
+
+    def delete_old(self, storage, dry_run):
+        directory = Post._meta.get_field('image').upload_to.rstrip('/')
+        if not storage.exists(directory):
+            return
+        names = [f'{directory}/{name}'
+                 for name in storage.listdir(directory)[1]]
+        used = set(Post.objects.filter(image__in=names).values_list(
+            'image', flat=True
+        ))
+        deleted = 0
+        for name in names:
+            if name in used:
+                continue
+            if not dry_run:
+                storage.delete(name)
+            self.stdout.write(name)
+            deleted += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено старых файлов: {deleted}'
+        ))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счётчики постов и подписок.'
+
+    def handle(self, *args, **options):
+        fixed = reconcile_counters()
+        self.stdout.write(self.style.SUCCESS(
+            f'Счётчики сверены, исправлено записей: {fixed}'
+        ))
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.seeding import CHUNK_SIZE, DEFAULT_VOLUMES, ZIPF_EXPONENT, seed
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет базу синтетическими пользователями, группами, постами, '
+        'комментариями и подписками для нагрузочных тестов.'
+    )
+
+    def add_arguments(self, parser):
+        for name, default in DEFAULT_VOLUMES.items():
+            parser.add_argument(f'--{name}', type=int, default=default)
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Зерно генератора: те же данные при '
+                                 'том же значении.')
+        parser.add_argument('--workers', type=int, default=0,
+                            help='Процессов для генерации строк.')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help='Строк в одной транзакции.')
+        parser.add_argument('--zipf', type=float, default=ZIPF_EXPONENT,
+                            help='Показатель распределения подписок.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        rows = seed(
+            random_seed=options['seed'],
+            workers=options['workers'],
+            chunk_size=options['chunk_size'],
+            zipf=options['zipf'],
+            **{name: options[name] for name in DEFAULT_VOLUMES},
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Добавлено строк: {rows} за {elapsed:.1f} с '
+            f'({rows / max(elapsed, 1e-9) * 60:,.0f} в минуту)'
+        ))
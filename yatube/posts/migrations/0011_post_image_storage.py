@@ -0,0 +1,23 @@
+# Generated by Django 2.2.16 on 2026-10-16 23:21
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """Хранилище не меняет схему, а AlterField на SQLite пересоздал бы
+    таблицу posts_post и потерял триггеры поискового индекса из 0010."""
+
+    dependencies = [
+        ('posts', '0010_post_fts'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(state_operations=[
+            migrations.AlterField(
+                model_name='post',
+                name='image',
+                field=models.ImageField(blank=True, storage=core.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='Картинка'),
+            ),
+        ]),
+    ]
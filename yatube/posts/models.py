@@ -2,6 +2,9 @@ from django.contrib.auth import get_user_model
 from django.db import models
 from django.conf import settings
 
+from core.models import AtomicSaveModel
+from core.storage import ContentAddressedStorage
+
 
 User = get_user_model()
 
@@ -15,7 +18,7 @@ class Group (models.Model):
         return self.title
 
 
-class Post(models.Model):
+class Post(AtomicSaveModel):
     text = models.TextField('Текст поста', help_text='Введите текст поста')
     pub_date = models.DateTimeField('Дата публикации', auto_now_add=True)
     author = models.ForeignKey(
@@ -36,19 +39,48 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True
     )
+    comments_count = models.IntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False
+    )
+
+    # Меняются только UPDATE ... + 1 из posts.counters: при сохранении
+    # загруженного поста значение из памяти могло устареть.
+    counter_fields = ('comments_count',)
 
     def __str__(self):
         return self.text[:settings.NUMBER_OF_CHARACTERS]
 
+    def save(self, *args, **kwargs):
+        if (not self._state.adding and not args
+                and kwargs.get('update_fields') is None
+                and not kwargs.get('force_insert')):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_id_idx'),
+        ]
 
 
-class Comment(models.Model):
+class Comment(AtomicSaveModel):
     text = models.TextField('Текст', help_text='Текст нового комментария')
     created = models.DateTimeField(
         'Дата и время публикации',
@@ -66,8 +98,12 @@ class Comment(models.Model):
         related_name='comments',
     )
 
+    class Meta:
+        indexes = [models.Index(fields=['post', 'created'],
+                                name='comment_post_created_idx')]
+
 
-class Follow(models.Model):
+class Follow(AtomicSaveModel):
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -83,3 +119,42 @@ class Follow(models.Model):
         constraints = [models.UniqueConstraint(
                        fields=['user', 'author'],
                        name='unique_follow')]
+        indexes = [models.Index(fields=['author', 'user'],
+                                name='follow_author_user_idx')]
+
+
+class UserCounters(models.Model):
+    """Денормализованные счётчики пользователя."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters',
+    )
+    posts_count = models.IntegerField('Число постов', default=0)
+    followers_count = models.IntegerField('Число подписчиков', default=0)
+    following_count = models.IntegerField('Число подписок', default=0)
+
+
+class TimelineEntry(models.Model):
+    """Пост в материализованной ленте подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ['-pub_date', '-post_id']
+        constraints = [models.UniqueConstraint(
+                       fields=['user', 'post'],
+                       name='unique_timeline_entry')]
+        indexes = [models.Index(
+                   fields=['user', '-pub_date', '-post'],
+                   name='timeline_user_pub_date_idx')]
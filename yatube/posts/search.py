@@ -0,0 +1,219 @@
+"""Полнотекстовый поиск по постам.
+
+На SQLite работает по индексу FTS5 posts_post_fts (миграция 0010):
+результаты упорядочены по bm25, совпадения в сниппете выделены <mark>.
+Страницы ищутся по курсору (релевантность, id), как и ленты. На других
+базах поиск деградирует до icontains без ранжирования.
+"""
+import base64
+import binascii
+import re
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from django.utils.text import Truncator
+
+from .models import Post
+
+FTS_TABLE = 'posts_post_fts'
+FTS_TRIGGERS = (
+    'posts_post_fts_insert', 'posts_post_fts_delete', 'posts_post_fts_update',
+)
+PREFIX_MIN_LENGTH = 3
+SNIPPET_TOKENS = 24
+# Маркеры совпадений в сниппете: управляющие символы переживают
+# экранирование HTML и затем заменяются на теги.
+MARK_START, MARK_END = '\x02', '\x03'
+
+
+def fts_available():
+    return connection.vendor == 'sqlite'
+
+
+def terms(text):
+    return re.findall(r'\w+', text.lower())[:16]
+
+
+def fts_query(text):
+    """Строка запроса MATCH из пользовательского ввода или None.
+
+    Синтаксис FTS5 (кавычки, NEAR, OR, двоеточия) пользователю не
+    доступен: каждое слово берётся в кавычки, слова от трёх букв
+    ищутся как префиксы, чтобы «кот» находил и «котика».
+    """
+    words = terms(text)
+    if not words:
+        return None
+    return ' '.join(
+        f'"{word}"*' if len(word) >= PREFIX_MIN_LENGTH else f'"{word}"'
+        for word in words
+    )
+
+
+def encode_cursor(score, pk):
+    raw = f'{score!r}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Возвращает (релевантность, id) из токена или None."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        score, pk = raw.decode().split('|')
+        return float(score), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def highlight(snippet):
+    return mark_safe(
+        escape(snippet).replace(MARK_START, '<mark>').replace(
+            MARK_END, '</mark>'
+        )
+    )
+
+
+def filter_posts(queryset, text):
+    """Оставляет в queryset посты, подходящие под запрос."""
+    if not fts_available():
+        for word in terms(text):
+            queryset = queryset.filter(text__icontains=word)
+        return queryset
+    query = fts_query(text)
+    if query is None:
+        return queryset
+    return queryset.filter(pk__in=RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [query]
+    ))
+
+
+def _ranked(query, cursor, limit):
+    sql = (
+        f'SELECT id, score FROM ('
+        f'SELECT rowid AS id, bm25({FTS_TABLE}) AS score FROM {FTS_TABLE} '
+        f'WHERE {FTS_TABLE} MATCH %s)'
+    )
+    params = [query]
+    if cursor is not None:
+        sql += ' WHERE score > %s OR (score = %s AND id < %s)'
+        params += [cursor[0], cursor[0], cursor[1]]
+    sql += ' ORDER BY score, id DESC LIMIT %s'
+    with connection.cursor() as db:
+        db.execute(sql, params + [limit])
+        return db.fetchall()
+
+
+def _snippets(query, ids):
+    # Сниппеты строятся отдельным запросом только для строк страницы,
+    # а не для всех совпадений.
+    placeholders = ', '.join(['%s'] * len(ids))
+    sql = (
+        f'SELECT rowid, snippet({FTS_TABLE}, 0, %s, %s, %s, %s) '
+        f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+        f'AND rowid IN ({placeholders})'
+    )
+    with connection.cursor() as db:
+        db.execute(sql, [MARK_START, MARK_END, '…', SNIPPET_TOKENS, query,
+                         *ids])
+        return dict(db.fetchall())
+
+
+def _fallback(text, cursor, limit):
+    posts = filter_posts(Post.objects.all(), text).order_by('-id')
+    if cursor is not None:
+        posts = posts.filter(id__lt=cursor[1])
+    return [(pk, 0.0) for pk in posts.values_list('pk', flat=True)[:limit]]
+
+
+def search_posts(text, after=None):
+    """Страница результатов поиска после курсора.
+
+    Возвращает список постов с атрибутом snippet и курсор следующей
+    страницы (None, если результатов больше нет).
+    """
+    per_page = settings.ENTRIES_THE_PAGE
+    cursor = decode_cursor(after)
+    query = fts_query(text)
+    if query is None:
+        return [], None
+    ranked = fts_available()
+    if ranked:
+        rows = _ranked(query, cursor, per_page + 1)
+    else:
+        rows = _fallback(text, cursor, per_page + 1)
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if not rows:
+        return [], None
+    ids = [pk for pk, _ in rows]
+    snippets = _snippets(query, ids) if ranked else {}
+    posts = Post.objects.select_related('author', 'group').in_bulk(ids)
+    results = []
+    for pk in ids:
+        post = posts.get(pk)
+        if post is None:
+            continue
+        snippet = snippets.get(pk)
+        post.snippet = (highlight(snippet) if snippet is not None
+                        else Truncator(post.text).words(SNIPPET_TOKENS))
+        results.append(post)
+    if not has_more:
+        return results, None
+    pk, score = rows[-1]
+    return results, encode_cursor(score, pk)
+
+
+def rebuild_index():
+    """Пересобирает индекс по таблице постов, возвращает число постов."""
+    if not fts_available():
+        return 0
+    with connection.cursor() as db:
+        db.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+        )
+        db.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')"
+        )
+    return Post.objects.count()
+
+
+def fts_triggers():
+    """Триггеры индекса на таблице постов: имя -> CREATE TRIGGER."""
+    with connection.cursor() as db:
+        db.execute(
+            "SELECT name, sql FROM sqlite_master "
+            "WHERE type = 'trigger' AND tbl_name = %s",
+            [Post._meta.db_table],
+        )
+        return {name: sql for name, sql in db.fetchall()
+                if name in FTS_TRIGGERS}
+
+
+@contextmanager
+def triggers_suspended():
+    """Снимает триггеры индекса на время массовой вставки постов.
+
+    Триггер пишет в индекс на каждую вставленную строку; вместо этого
+    индекс один раз пересобирается в конце, после чего триггеры
+    создаются заново в прежнем виде.
+    """
+    if not fts_available():
+        yield
+        return
+    saved = fts_triggers()
+    with connection.cursor() as db:
+        for name in saved:
+            db.execute(f'DROP TRIGGER {name}')
+    try:
+        yield
+    finally:
+        with connection.cursor() as db:
+            for sql in saved.values():
+                db.execute(sql)
+        rebuild_index()
@@ -0,0 +1,319 @@
+"""Быстрое наполнение базы синтетическими данными для нагрузочных тестов.
+
+Строки вставляются сырыми многострочными INSERT пачками по chunk_size,
+каждая пачка в своей транзакции. Первичные ключи назначаются заранее
+подряд после текущего максимума, поэтому пачки разных таблиц не
+зависят друг от друга и могут генерироваться в отдельных процессах.
+Генератор каждой пачки засевается от (random_seed, таблица, номер
+пачки): данные одинаковы при любом числе процессов.
+"""
+import bisect
+import datetime as dt
+import math
+import random
+from contextlib import contextmanager
+from functools import lru_cache
+from itertools import accumulate
+from multiprocessing import Pool
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.color import no_style
+from django.db import connection, transaction
+
+from .counters import actual_comments_count, actual_user_counts
+from .models import Comment, Follow, Group, Post, TimelineEntry, UserCounters
+from .search import triggers_suspended
+
+User = get_user_model()
+
+DEFAULT_VOLUMES = {
+    'users': 10000,
+    'groups': 100,
+    'posts': 1000000,
+    'comments': 5000000,
+    'follows': 1000000,
+}
+CHUNK_SIZE = 10000
+ZIPF_EXPONENT = 1.1
+PERIOD = dt.timedelta(days=365)
+WORDS = (
+    'пост лента подписка автор группа комментарий новость день город '
+    'утро вечер кофе книга фильм музыка прогулка работа проект идея код '
+    'python django сервер база запрос индекс кеш страница фото отпуск '
+    'море горы дорога друзья семья кот собака погода весна лето осень '
+    'зима праздник встреча планы вопрос ответ спасибо привет'
+).split()
+USERNAME_PREFIX = 'seed_'
+SQLITE_PRAGMAS = {
+    'synchronous': 'OFF',
+    'journal_mode': 'MEMORY',
+    'cache_size': -262144,
+    'temp_store': 'MEMORY',
+}
+
+
+@lru_cache(maxsize=4)
+def _zipf_weights(size, exponent):
+    return list(accumulate(1 / rank ** exponent
+                           for rank in range(1, size + 1)))
+
+
+def _zipf(rng, first_pk, size, exponent):
+    """pk с вероятностью, обратной степени ранга: первые pk популярнее."""
+    weights = _zipf_weights(size, exponent)
+    return first_pk + bisect.bisect(weights, rng.random() * weights[-1])
+
+
+@lru_cache(maxsize=4)
+def _shuffled(size, seed):
+    ranks = list(range(size))
+    random.Random(seed).shuffle(ranks)
+    return ranks
+
+
+def _text(rng, median_words, sigma):
+    # Длины текстов в соцсетях близки к логнормальному распределению:
+    # много коротких и длинный хвост.
+    words = max(1, int(rng.lognormvariate(math.log(median_words), sigma)))
+    return ' '.join(rng.choice(WORDS) for _ in range(min(words, 2000)))
+
+
+def _post_date(plan, index):
+    return plan['start'] + PERIOD * index / max(plan['posts'], 1)
+
+
+def _users(rng, plan, first, count):
+    joined = str(plan['start'])
+    for pk in range(first, first + count):
+        yield (pk, '!', False, f'{USERNAME_PREFIX}{pk}', '', '', '',
+               False, True, joined)
+
+
+def _groups(rng, plan, first, count):
+    for pk in range(first, first + count):
+        yield pk, f'Группа {pk}', f'seed-{pk}', _text(rng, 12, 0.5)
+
+
+def _posts(rng, plan, first, count):
+    users, groups = plan['user_pk'], plan['group_pk']
+    for pk in range(first, first + count):
+        index = pk - plan['post_pk'][0]
+        group = (rng.randrange(*groups)
+                 if groups[0] < groups[1] and rng.random() < 0.7 else None)
+        # Активность авторов тоже по Зипфу, но с другим порядком рангов:
+        # иначе самые плодовитые авторы совпали бы с самыми популярными
+        # и ленты подписок разрослись бы на порядки.
+        rank = _zipf(rng, 0, users[1] - users[0], 0.8)
+        author = users[0] + _shuffled(users[1] - users[0], plan['seed'])[rank]
+        yield (pk, _text(rng, 40, 0.9), str(_post_date(plan, index)),
+               author, group, '', 0)
+
+
+def _comments(rng, plan, first, count):
+    users, posts = plan['user_pk'], plan['post_pk']
+    for pk in range(first, first + count):
+        post = rng.randrange(*posts)
+        created = _post_date(plan, post - posts[0]) + dt.timedelta(
+            seconds=rng.expovariate(1 / 3600)
+        )
+        yield (pk, _text(rng, 10, 0.8), str(created), post,
+               rng.randrange(*users))
+
+
+def _follows(rng, plan, first, count):
+    # Пачка follows — это блок подписчиков, поэтому пары (user, author)
+    # уникальны без общей проверки между пачками.
+    users = plan['user_pk']
+    size = users[1] - users[0]
+    per_user, extra = divmod(plan['follows'], size)
+    for user in range(first, first + count):
+        wanted = min(per_user + (user - users[0] < extra), size - 1)
+        authors = set()
+        while len(authors) < wanted:
+            author = _zipf(rng, users[0], size, plan['zipf'])
+            if author != user:
+                authors.add(author)
+        for author in sorted(authors):
+            yield user, author
+
+
+TABLES = [
+    (User, ('id', 'password', 'is_superuser', 'username', 'first_name',
+            'last_name', 'email', 'is_staff', 'is_active', 'date_joined'),
+     'users', _users),
+    (Group, ('id', 'title', 'slug', 'description'), 'groups', _groups),
+    (Post, ('id', 'text', 'pub_date', 'author_id', 'group_id', 'image',
+            'comments_count'), 'posts', _posts),
+    (Comment, ('id', 'text', 'created', 'post_id', 'author_id'),
+     'comments', _comments),
+    (Follow, ('user_id', 'author_id'), 'follows', _follows),
+]
+
+
+def _generate(task):
+    table, chunk, first, count, plan = task
+    rng = random.Random(f'{plan["seed"]}:{table}:{chunk}')
+    generator = TABLES[table][3]
+    return table, list(generator(rng, plan, first, count))
+
+
+def _next_pk(model):
+    last = model.objects.order_by('-pk').values_list('pk', flat=True).first()
+    return (last or 0) + 1
+
+
+def _tasks(plan, chunk_size):
+    for table, (model, columns, volume, generator) in enumerate(TABLES):
+        if volume == 'follows':
+            first, total = plan['user_pk'][0], plan['users']
+        else:
+            first, total = plan[f'{volume[:-1]}_pk'][0], plan[volume]
+        for chunk, offset in enumerate(range(0, total, chunk_size)):
+            yield (table, chunk, first + offset,
+                   min(chunk_size, total - offset), plan)
+
+
+def _insert(model, columns, rows):
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        connection.ops.quote_name(model._meta.db_table),
+        ', '.join(connection.ops.quote_name(
+            model._meta.get_field(name).column
+        ) for name in columns),
+        ', '.join(['%s'] * len(columns)),
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def _fill_counters(first_user):
+    users = User.objects.filter(pk__gte=first_user).annotate(
+        **actual_user_counts()
+    ).values_list(
+        'pk', 'actual_posts', 'actual_followers', 'actual_following'
+    )
+    _insert(UserCounters, ('user', 'posts_count', 'followers_count',
+                           'following_count'), list(users))
+    Post.objects.filter(author_id__gte=first_user).update(
+        comments_count=actual_comments_count()
+    )
+
+
+def _fill_timelines(first_user):
+    # Ленты строятся одним INSERT ... SELECT вместо поштучного
+    # backfill_timeline; авторы-«знаменитости» в них не попадают.
+    sql = (
+        'INSERT INTO {timeline} (user_id, post_id, pub_date) '
+        'SELECT f.user_id, p.id, p.pub_date FROM {follow} f '
+        'JOIN {post} p ON p.author_id = f.author_id '
+        'JOIN {counters} c ON c.user_id = f.author_id '
+        'WHERE f.user_id >= %s AND c.followers_count < %s'
+    ).format(**{
+        name: connection.ops.quote_name(model._meta.db_table)
+        for name, model in (('timeline', TimelineEntry), ('follow', Follow),
+                            ('post', Post), ('counters', UserCounters))
+    })
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(sql, [first_user, settings.FEED_CELEBRITY_FOLLOWERS])
+
+
+def _reset_sequences():
+    statements = connection.ops.sequence_reset_sql(
+        no_style(), [model for model, *_ in TABLES]
+    )
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+@contextmanager
+def _tuned_sqlite():
+    # Синтетические данные не жалко потерять при сбое, поэтому на время
+    # наполнения журнал держим в памяти и не ждём fsync. Внутри
+    # транзакции SQLite эти настройки менять не даёт. Соединение
+    # живёт дольше наполнения, поэтому прежние значения возвращаются.
+    if connection.vendor != 'sqlite' or connection.in_atomic_block:
+        yield
+        return
+    with connection.cursor() as cursor:
+        saved = {}
+        for pragma, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {pragma}')
+            saved[pragma] = cursor.fetchone()[0]
+            cursor.execute(f'PRAGMA {pragma} = {value}')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            for pragma, value in saved.items():
+                cursor.execute(f'PRAGMA {pragma} = {value}')
+
+
+def seed(users, groups, posts, comments, follows, random_seed=0,
+         workers=0, chunk_size=CHUNK_SIZE, zipf=ZIPF_EXPONENT, until=None):
+    """Добавляет в базу синтетические данные заданного объёма.
+
+    Подписки распределены по Зипфу: немногие авторы собирают большую
+    часть подписчиков. При workers > 1 пачки генерируются в пуле
+    процессов, а пишет в базу только текущий процесс: SQLite всё равно
+    допускает одного писателя. Счётчики и ленты подписок заполняются
+    в конце одним проходом, поисковый индекс — одной пересборкой.
+    Возвращает число вставленных строк.
+    """
+    if until is None:
+        until = dt.datetime.combine(dt.date.today(), dt.time())
+    plan = {
+        'seed': random_seed, 'zipf': zipf, 'start': until - PERIOD,
+        'users': users, 'groups': groups, 'posts': posts if users else 0,
+        'comments': comments if users and posts else 0,
+        'follows': follows if users > 1 else 0,
+    }
+    for model, volume in ((User, 'user'), (Group, 'group'),
+                          (Post, 'post'), (Comment, 'comment')):
+        first = _next_pk(model)
+        plan[f'{volume}_pk'] = (first, first + plan[f'{volume}s'])
+    tasks = _tasks(plan, chunk_size)
+    inserted = 0
+    with _tuned_sqlite(), triggers_suspended():
+        with Pool(workers) if workers > 1 else _Serial() as pool:
+            for table, rows in pool.imap(_generate, tasks):
+                model, columns = TABLES[table][:2]
+                _insert(model, columns, rows)
+                inserted += len(rows)
+        _reset_sequences()
+        _fill_counters(plan['user_pk'][0])
+        _fill_timelines(plan['user_pk'][0])
+    return inserted
+
+
+def planned_volumes(users, groups, posts, comments, follows):
+    """Сколько строк каждой таблицы добавит seed() с такими объёмами."""
+    if users > 1:
+        per_user, extra = divmod(follows, users)
+        follows = (extra * min(per_user + 1, users - 1)
+                   + (users - extra) * min(per_user, users - 1))
+    else:
+        follows = 0
+    return {
+        'users': users, 'groups': groups, 'posts': posts if users else 0,
+        'comments': comments if users and posts else 0, 'follows': follows,
+    }
+
+
+def seeded_volumes():
+    """Сколько строк каждой таблицы уже есть в базе."""
+    return {volume: model.objects.count()
+            for model, columns, volume, generator in TABLES}
+
+
+class _Serial:
+    """Заглушка пула процессов для генерации в текущем процессе."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def imap(self, function, iterable):
+        return map(function, iterable)
@@ -0,0 +1,74 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import caching, counters, feeds, uploads
+from .models import Comment, Follow, Post, User, UserCounters
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    if created:
+        UserCounters.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, **kwargs):
+    # Пост могли перенести в другую группу: её кеш тоже нужно сбросить.
+    instance._previous_group_id = instance._previous_image = None
+    if instance.pk is not None:
+        instance._previous_group_id, instance._previous_image = (
+            Post.objects.filter(pk=instance.pk).values_list(
+                'group_id', 'image'
+            ).first() or (None, None)
+        )
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user_counters(instance.author_id, posts_count=1)
+        feeds.fan_out_post(instance)
+    caching.bump_post_generations(
+        instance, getattr(instance, '_previous_group_id', None)
+    )
+    if instance.image and instance.image.name != getattr(
+            instance, '_previous_image', None):
+        uploads.schedule_processing(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.change_user_counters(instance.author_id, posts_count=-1)
+    caching.bump_post_generations(instance)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change_comments_count(instance.post_id, 1)
+    caching.bump_comment_generations(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change_comments_count(instance.post_id, -1)
+    caching.bump_comment_generations(instance)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created:
+        followers = counters.change_followers_counts([instance.author_id], 1)
+        counters.change_user_counters(instance.user_id, following_count=1)
+        feeds.backfill_timeline(instance.user_id, instance.author_id,
+                                followers[instance.author_id])
+        caching.bump_feed_versions([instance.user_id])
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    followers = counters.change_followers_counts([instance.author_id], -1)
+    counters.change_user_counters(instance.user_id, following_count=-1)
+    feeds.prune_timeline(instance.user_id, instance.author_id,
+                         followers[instance.author_id])
+    caching.bump_feed_versions([instance.user_id])
@@ -0,0 +1,66 @@
+import datetime as dt
+
+from django.conf import settings
+from django.utils import timezone
+
+from tasks.queue import enqueue, task
+
+from . import caching, feeds
+from .models import Post
+from .thumbnails import generate_thumbnails
+from .uploads import process_original
+
+
+@task(name='posts.generate_thumbnails')
+def generate_post_thumbnails(post_id):
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.image:
+        return
+    generate_thumbnails(post.image)
+    # Страницы с заглушкой могли попасть в кеш: сбрасываем их.
+    caching.bump_post_generations(post)
+
+
+@task(name='posts.process_image')
+def process_post_image(post_id):
+    """Уменьшает оригинал картинки поста, затем генерирует миниатюры."""
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.image:
+        return
+    original = post.image.name
+    processed = process_original(post.image)
+    if processed is not None and processed != original:
+        # Тот же файл мог быть загружен и к другим постам.
+        Post.objects.filter(image=original).update(image=processed)
+        caching.bump_batch_generations(Post.objects.filter(
+            image=processed
+        ).only('pk', 'author_id', 'group_id'))
+        enqueue(discard_image, args=[original],
+                delay=settings.POST_IMAGE_DISCARD_DELAY)
+    generate_post_thumbnails(post_id)
+
+
+@task(name='posts.backfill_followers')
+def backfill_follower_timelines(author_id):
+    """Разносит посты бывшей «знаменитости» по лентам подписчиков."""
+    feeds.backfill_followers(author_id)
+    caching.bump_author_generation(author_id)
+
+
+@task(name='posts.discard_image')
+def discard_image(name):
+    """Удаляет файл картинки, если он больше не нужен ни одному посту.
+
+    Файл, загруженный заново за последние POST_IMAGE_DISCARD_DELAY
+    секунд, остаётся: пост с ним мог ещё не закоммититься, а его
+    обработка поставит удаление снова.
+    """
+    storage = Post._meta.get_field('image').storage
+    if not storage.exists(name) or Post.objects.filter(image=name).exists():
+        return
+    recent = timezone.now() - dt.timedelta(
+        seconds=settings.POST_IMAGE_DISCARD_DELAY
+    )
+    if storage.get_modified_time(name) > recent:
+        return
+    storage.delete(name)
@@ -0,0 +1,65 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from core.benchmark import percentile, regressions
+from core.management.commands.benchmark import Command
+from ..seeding import seeded_volumes
+
+
+class BenchmarkTests(TestCase):
+    def test_percentile_nearest_rank(self):
+        """Перцентили считаются по ближайшему рангу."""
+        samples = list(range(1, 101))
+        self.assertEqual(percentile(samples, 50), 50)
+        self.assertEqual(percentile(samples, 99), 99)
+        self.assertEqual(percentile([7], 95), 7)
+
+    def test_regressions_over_threshold(self):
+        """Регрессией считается рост латентности сверх порога и запросов."""
+        baseline = {'posts:index': {
+            'p50_ms': 10, 'p95_ms': 20, 'p99_ms': 30, 'queries': 3,
+        }}
+        results = {'posts:index': {
+            'p50_ms': 11, 'p95_ms': 30, 'p99_ms': 30, 'queries': 4,
+        }}
+        self.assertEqual(regressions(results, baseline, 0.2), [
+            ('posts:index', 'p95_ms', 20, 30),
+            ('posts:index', 'queries', 3, 4),
+        ])
+
+    def test_command_writes_report(self):
+        """Команда benchmark замеряет все маршруты и пишет JSON."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'report.json')
+            call_command(
+                'benchmark', in_place=True, users=5, groups=2, posts=30,
+                comments=40, follows=8, requests=2, output=path,
+                stdout=StringIO(),
+            )
+            with open(path, encoding='utf-8') as file:
+                report = json.load(file)
+        self.assertEqual(report['meta']['volumes']['posts'], 30)
+        for name in ('posts:index', 'users:login', 'about:tech'):
+            with self.subTest(name=name):
+                result = report['results'][name]
+                self.assertEqual(result['status'], 200)
+                self.assertGreater(result['bytes'], 0)
+        self.assertNotIn('users:logout', report['results'])
+
+    def test_kept_database_is_seeded_once(self):
+        """С --keepdb повторный прогон не добавляет данные в базу."""
+        volumes = {'users': 5, 'groups': 2, 'posts': 30, 'comments': 40,
+                   'follows': 30}
+        options = {'keepdb': True, 'in_place': False, 'seed': 0}
+        command = Command()
+        self.assertFalse(command.prepare(volumes, options))
+        found = seeded_volumes()
+        self.assertTrue(command.prepare(volumes, options))
+        self.assertEqual(seeded_volumes(), found)
+        with self.assertRaises(CommandError):
+            command.prepare(dict(volumes, posts=60), options)
@@ -0,0 +1,143 @@
+import shutil
+import tempfile
+from http import HTTPStatus
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.timing import InstrumentedFileBasedCache
+from ..caching import GLOBAL_GENERATION_KEY, generation
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class ConditionalPageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username="Kirill")
+        cls.author = User.objects.create(username="author")
+        cls.group = Group.objects.create(
+            title="Тестовая группа",
+            slug="test-slug",
+            description="Тестовое описание",
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, text="Тестовый пост", group=cls.group
+        )
+        cls.urls = [
+            reverse("posts:index"),
+            reverse("posts:group_list", kwargs={"slug": cls.group.slug}),
+            reverse("posts:profile", kwargs={"username": cls.author}),
+            reverse("posts:post_detail", kwargs={"post_id": cls.post.id}),
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_not_modified_until_content_changes(self):
+        """Страницы отвечают 304, пока не изменились их данные."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.guest_client.get(url)['ETag']
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.NOT_MODIFIED)
+        etags = [self.guest_client.get(url)['ETag'] for url in self.urls]
+        self.post.text = "Изменённый пост"
+        self.post.save()
+        for url, etag in zip(self.urls, etags):
+            with self.subTest(url=url):
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_anonymous_page_served_from_cache(self):
+        """Из кеша страница отдаётся за один запрос поиска поколения."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                first = self.guest_client.get(url)
+                with CaptureQueriesContext(connection) as context:
+                    second = self.guest_client.get(url)
+                self.assertEqual(first.content, second.content)
+                self.assertLessEqual(len(context.captured_queries), 1)
+
+    def test_extra_parameters_share_cache_entry(self):
+        """Посторонние параметры не создают новых записей в кеше."""
+        url = self.urls[0]
+        self.guest_client.get(url)
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            for suffix in ('?x=1', '?x=2&page=1', '?page=abc', '?after=x'):
+                with self.subTest(suffix=suffix):
+                    response = self.guest_client.get(url + suffix)
+                    self.assertEqual(response.status_code, HTTPStatus.OK)
+            self.guest_client.get(url + '?page=2')
+        pages = [call for call in cache_set.call_args_list
+                 if call[0][0].startswith('page:')]
+        self.assertEqual(len(pages), 1)
+
+    def test_authorized_pages_are_not_shared(self):
+        """Авторизованный пользователь не получает анонимную копию."""
+        guest_etag = self.guest_client.get(self.urls[0])['ETag']
+        response = self.authorized_client.get(self.urls[0])
+        self.assertNotEqual(response['ETag'], guest_etag)
+        self.assertContains(response, self.user.username)
+
+    def test_follow_changes_profile_etag(self):
+        """После подписки профиль не отвечает 304 со старой кнопкой."""
+        url = self.urls[2]
+        etag = self.authorized_client.get(url)['ETag']
+        self.authorized_client.get(
+            reverse("posts:profile_follow", kwargs={"username": self.author})
+        )
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, "Отписаться")
+
+
+class SharedCacheTests(TestCase):
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location, ignore_errors=True)
+        self.config = {
+            'BACKEND': 'core.timing.InstrumentedFileBasedCache',
+            'LOCATION': self.location,
+            'KEY_PREFIX': 'site',
+        }
+
+    def test_generation_visible_to_other_processes(self):
+        """Сброс поколения виден кешу другого процесса."""
+        other = InstrumentedFileBasedCache(self.location, self.config)
+        with override_settings(CACHES={'default': self.config}):
+            before = generation(GLOBAL_GENERATION_KEY)
+            Post.objects.create(
+                author=User.objects.create(username="writer"), text="Пост"
+            )
+            after = generation(GLOBAL_GENERATION_KEY)
+        self.assertNotEqual(after, before)
+        self.assertEqual(str(other.get(GLOBAL_GENERATION_KEY)), after)
+
+    def test_directory_not_listed_on_every_write(self):
+        """Каталог кеша читается не при каждой записи."""
+        file_cache = InstrumentedFileBasedCache(self.location, self.config)
+        with mock.patch.object(
+            FileBasedCache, '_list_cache_files',
+            autospec=True, side_effect=FileBasedCache._list_cache_files,
+        ) as listing:
+            for index in range(5):
+                file_cache.set(f'key-{index}', index)
+        self.assertLessEqual(listing.call_count, 1)
+        self.assertEqual(file_cache.get('key-4'), 4)
@@ -0,0 +1,82 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.shortcuts import get_object_or_404
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from ..models import Comment, Follow, Post, UserCounters
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username="author")
+        cls.reader = User.objects.create(username="reader")
+
+    def counters(self, user):
+        return UserCounters.objects.get(user=user)
+
+    def test_counters_follow_saves_and_deletes(self):
+        """Счётчики меняются при создании и удалении записей."""
+        post = Post.objects.create(author=self.author, text="Пост")
+        comment = Comment.objects.create(
+            author=self.reader, post=post, text="Коммент"
+        )
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.counters(self.author).posts_count, 1)
+        self.assertEqual(self.counters(self.author).followers_count, 1)
+        self.assertEqual(self.counters(self.reader).following_count, 1)
+        comment.delete()
+        follow.delete()
+        post.delete()
+        self.assertEqual(self.counters(self.author).posts_count, 0)
+        self.assertEqual(self.counters(self.author).followers_count, 0)
+        self.assertEqual(self.counters(self.reader).following_count, 0)
+
+    def test_reconcile_counters_repairs_drift(self):
+        """Команда reconcile_counters исправляет расхождения."""
+        Post.objects.bulk_create(
+            [Post(author=self.author, text=f"Пост {i}") for i in range(3)]
+        )
+        UserCounters.objects.filter(user=self.reader).delete()
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertEqual(self.counters(self.author).posts_count, 3)
+        self.assertTrue(UserCounters.objects.filter(user=self.reader))
+
+    def test_profile_reads_stored_counter(self):
+        """Страница профиля выводит сохранённый счётчик постов."""
+        Post.objects.create(author=self.author, text="Пост")
+        UserCounters.objects.filter(user=self.author).update(posts_count=42)
+        response = Client().get(
+            reverse("posts:profile", kwargs={"username": self.author})
+        )
+        self.assertContains(response, "Всего постов: 42")
+
+    def test_edit_keeps_concurrent_comments(self):
+        """Правка поста не затирает комментарии, добавленные во время неё."""
+        post = Post.objects.create(author=self.author, text="Пост")
+
+        def load_then_comment(*args, **kwargs):
+            loaded = get_object_or_404(*args, **kwargs)
+            Comment.objects.create(author=self.reader, post=post,
+                                   text="Коммент")
+            return loaded
+
+        client = Client()
+        client.force_login(self.author)
+        with mock.patch('posts.views.get_object_or_404',
+                        side_effect=load_then_comment):
+            client.post(reverse('posts:post_edit',
+                                kwargs={'post_id': post.pk}),
+                        {'text': "Новый текст"})
+        post.refresh_from_db()
+        self.assertEqual((post.text, post.comments_count),
+                         ("Новый текст", 1))
@@ -0,0 +1,215 @@
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.cache import cache
+from django.core.paginator import Page
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..counters import change_followers_counts
+from ..feeds import HybridFeed, became_celebrity, follow_feed, timeline_posts
+from ..models import Follow, Post, TimelineEntry
+from ..tasks import backfill_follower_timelines
+from ..utils import CursorPaginator
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create(username="reader")
+        cls.author = User.objects.create(username="author")
+        cls.stranger = User.objects.create(username="stranger")
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост попадает в ленты только подписчиков автора."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text="Новый пост")
+        Post.objects.create(author=self.stranger, text="Чужой пост")
+        self.assertEqual(list(timeline_posts(self.reader)), [post])
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка дополняет ленту старыми постами, отписка чистит её."""
+        posts = [Post.objects.create(author=self.author, text=f"Пост {i}")
+                 for i in range(3)]
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(list(timeline_posts(self.reader)), posts[::-1])
+        follow.delete()
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader))
+
+    def test_rebuild_timelines_command(self):
+        """Команда rebuild_timelines восстанавливает ленты по Follow."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text="Пост")
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(list(timeline_posts(self.reader)), [post])
+
+
+@override_settings(FEED_CELEBRITY_FOLLOWERS=2)
+class HybridFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create(username="reader")
+        cls.fan = User.objects.create(username="fan")
+        cls.star = User.objects.create(username="star")
+        cls.author = User.objects.create(username="author")
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Follow.objects.create(user=cls.reader, author=cls.star)
+        Follow.objects.create(user=cls.fan, author=cls.star)
+
+    def test_celebrity_posts_are_not_fanned_out(self):
+        """Посты автора с большим числом подписчиков не пишутся в ленты."""
+        Post.objects.create(author=self.star, text="Пост звезды")
+        self.assertFalse(
+            TimelineEntry.objects.filter(post__author=self.star).exists()
+        )
+
+    def test_feed_merges_celebrity_posts_by_date(self):
+        """Лента сливает посты звезды с материализованной частью."""
+        posts = [
+            Post.objects.create(author=author, text=f"Пост {i}")
+            for i, author in enumerate(
+                [self.star, self.author, self.star, self.author]
+            )
+        ]
+        feed = follow_feed(self.reader)
+        self.assertIsInstance(feed, HybridFeed)
+        self.assertEqual(list(feed[:3]), posts[::-1][:3])
+        self.assertEqual(list(feed[1:4]), posts[::-1][1:4])
+        paginator = CursorPaginator(feed, 2)
+        first = paginator.get_cursor_page()
+        # По одному запросу на источник, не больше страницы из каждого.
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(first.object_list, posts[::-1][:2])
+        self.assertEqual(len(queries), 2)
+        self.assertTrue(all('LIMIT 3' in query['sql'] for query in queries))
+        second = paginator.get_cursor_page(after=first.next_cursor)
+        self.assertEqual(second.object_list, posts[::-1][2:])
+        self.assertFalse(second.has_next())
+        previous = paginator.get_cursor_page(before=second.previous_cursor)
+        self.assertEqual(previous.object_list, first.object_list)
+
+    def test_feed_page_from_cache_skips_merge(self):
+        """Страница ленты из кеша фрагментов не читает источники."""
+        Post.objects.create(author=self.star, text="Пост звезды")
+        client = Client()
+        client.force_login(self.reader)
+        client.get(reverse("posts:follow_index"))
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse("posts:follow_index"))
+        self.assertContains(response, "Пост звезды")
+        self.assertFalse(any(
+            'posts_post' in query['sql'] for query in queries
+        ))
+
+    def test_new_celebrity_entries_are_dropped(self):
+        """Ставшего «знаменитостью» автора убирают из лент подписчиков."""
+        author = User.objects.create(username="rising")
+        Follow.objects.create(user=self.reader, author=author)
+        Post.objects.create(author=author, text="Пост")
+        self.assertTrue(TimelineEntry.objects.filter(post__author=author))
+        Follow.objects.create(user=self.fan, author=author)
+        self.assertFalse(TimelineEntry.objects.filter(post__author=author))
+
+    def test_author_below_threshold_is_backfilled(self):
+        """Когда звезда теряет подписчиков, её посты разносит очередь."""
+        post = Post.objects.create(author=self.star, text="Пост звезды")
+        with mock.patch('posts.feeds.enqueue') as enqueue:
+            Follow.objects.filter(user=self.fan, author=self.star).delete()
+        enqueue.assert_called_once_with('posts.backfill_followers',
+                                        args=[self.star.pk])
+        self.assertEqual(list(follow_feed(self.reader)), [])
+        backfill_follower_timelines(self.star.pk)
+        self.assertEqual(list(follow_feed(self.reader)), [post])
+
+    def test_followers_counts_before_and_after(self):
+        """Порог сравнивается по числу подписчиков до и после изменения."""
+        self.assertEqual(
+            change_followers_counts([self.star.pk, self.author.pk], 1),
+            {self.star.pk: (2, 3), self.author.pk: (1, 2)},
+        )
+        self.assertTrue(became_celebrity((1, 3)))
+        self.assertFalse(became_celebrity((2, 3)))
+
+
+class FollowFeedCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create(username="reader")
+        cls.other = User.objects.create(username="other")
+        cls.author = User.objects.create(username="author")
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.other_client = Client()
+        self.other_client.force_login(self.other)
+
+    def test_feed_fragment_is_not_shared_between_users(self):
+        """Закешированная лента одного пользователя не видна другому."""
+        Post.objects.create(author=self.author, text="Пост для подписчика")
+        self.reader_client.get(reverse("posts:follow_index"))
+        response = self.other_client.get(reverse("posts:follow_index"))
+        self.assertNotContains(response, "Пост для подписчика")
+
+    def test_feed_without_celebrities_pages_by_cursor(self):
+        """Лента без «знаменитостей» листается по курсору, без COUNT(*)."""
+        posts = [Post.objects.create(author=self.author, text=f"Пост {i}")
+                 for i in range(settings.ENTRIES_THE_PAGE + 1)]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.reader_client.get(reverse("posts:follow_index"))
+        page_obj = response.context["page_obj"]
+        self.assertIs(type(page_obj), Page)
+        self.assertEqual(list(page_obj), posts[::-1][:-1])
+        self.assertFalse(any(
+            'COUNT(' in query['sql'] or 'OFFSET' in query['sql']
+            for query in queries
+        ))
+        response = self.reader_client.get(
+            reverse("posts:follow_index") + f"?after={page_obj.next_cursor()}"
+        )
+        self.assertEqual(list(response.context["page_obj"]), posts[:1])
+
+    def test_feed_fragment_refreshes_on_new_post(self):
+        """Новый пост автора сразу виден в закешированной ленте."""
+        self.reader_client.get(reverse("posts:follow_index"))
+        Post.objects.create(author=self.author, text="Свежий пост")
+        response = self.reader_client.get(reverse("posts:follow_index"))
+        self.assertContains(response, "Свежий пост")
+
+    def test_feed_fragment_refreshes_on_unfollow(self):
+        """После отписки посты автора пропадают из ленты."""
+        Post.objects.create(author=self.author, text="Старый пост")
+        self.reader_client.get(reverse("posts:follow_index"))
+        self.reader_client.get(reverse(
+            "posts:profile_unfollow", kwargs={"username": self.author}
+        ))
+        response = self.reader_client.get(reverse("posts:follow_index"))
+        self.assertNotContains(response, "Старый пост")
+
+    def test_new_post_does_not_write_per_follower(self):
+        """Пост автора не пишет в кеш по ключу на каждого подписчика."""
+        for index in range(3):
+            Follow.objects.create(
+                user=User.objects.create(username=f"follower_{index}"),
+                author=self.author,
+            )
+        with mock.patch.object(cache, 'set_many',
+                               wraps=cache.set_many) as set_many:
+            Post.objects.create(author=self.author, text="Пост")
+        written = [key for call in set_many.call_args_list
+                   for key in call.args[0]]
+        self.assertFalse([key for key in written
+                          if key.startswith('feed_version:')])
@@ -0,0 +1,167 @@
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+from http import HTTPStatus
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.metrics import AGGREGATE_FILE, registry
+from ..models import Post
+from ..thumbnails import generate_thumbnails
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+TEMP_METRICS_DIR = tempfile.mkdtemp()
+TOKEN = 'secret'
+
+User = get_user_model()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, METRICS_DIR=TEMP_METRICS_DIR,
+                   METRICS_FLUSH_INTERVAL=0, METRICS_TOKEN=TOKEN)
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username="Kirill")
+        cls.author = User.objects.create(username="author")
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        shutil.rmtree(TEMP_METRICS_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        registry.clear()
+        self.client.force_login(self.user)
+
+    def scrape(self):
+        response = self.client.get(reverse("metrics"),
+                                   HTTP_AUTHORIZATION=f'Bearer {TOKEN}')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return response.content.decode()
+
+    def test_access_requires_token_or_staff(self):
+        """Адрес 127.0.0.1 не даёт доступа: нужен токен или staff."""
+        cases = (
+            ({}, HTTPStatus.NOT_FOUND),
+            ({'HTTP_AUTHORIZATION': 'Bearer wrong'}, HTTPStatus.NOT_FOUND),
+            ({'HTTP_AUTHORIZATION': f'Bearer {TOKEN}'}, HTTPStatus.OK),
+        )
+        for headers, status in cases:
+            with self.subTest(headers=headers):
+                response = self.client.get(
+                    reverse("metrics"), REMOTE_ADDR='127.0.0.1', **headers
+                )
+                self.assertEqual(response.status_code, status)
+        staff = User.objects.create(username="admin", is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_latency_histogram_per_view(self):
+        """Гистограммы латентности и запросов ведутся по имени маршрута."""
+        self.client.get(reverse("posts:index"))
+        self.client.get(reverse("posts:index"))
+        text = self.scrape()
+        self.assertIn('# TYPE yatube_request_duration_seconds histogram',
+                      text)
+        self.assertIn(
+            'yatube_request_duration_seconds_count{view="posts:index"} 2',
+            text,
+        )
+        self.assertIn(
+            'yatube_request_queries_bucket{le="+Inf",view="posts:index"} 2',
+            text,
+        )
+        self.assertIn('yatube_cache_requests_total{alias="default",'
+                      'result="hit"}', text)
+
+    def test_actions_are_counted(self):
+        """Создание поста, комментарий и подписка попадают в счётчики."""
+        self.client.post(reverse("posts:post_create"), {"text": "Пост"})
+        post_id = self.user.posts.get().pk
+        self.client.post(
+            reverse("posts:add_comment", kwargs={"post_id": post_id}),
+            {"text": "Комментарий"},
+        )
+        for _ in range(2):
+            self.client.get(reverse(
+                "posts:profile_follow", kwargs={"username": self.author}
+            ))
+        text = self.scrape()
+        for action in ('post_create', 'add_comment', 'profile_follow'):
+            with self.subTest(action=action):
+                self.assertIn(
+                    f'yatube_actions_total{{action="{action}"}} 1', text
+                )
+
+    def test_samples_summed_across_processes(self):
+        """Значения из файлов других процессов складываются."""
+        path = os.path.join(TEMP_METRICS_DIR, '1-0.json')
+        with open(path, 'w') as file:
+            json.dump([['yatube_actions_total', [['action', 'add_comment']],
+                        3]], file)
+        try:
+            post = Post.objects.create(author=self.author, text="Пост")
+            self.client.post(
+                reverse("posts:add_comment", kwargs={"post_id": post.pk}),
+                {"text": "Комментарий"},
+            )
+            text = self.scrape()
+        finally:
+            os.remove(path)
+        self.assertIn('yatube_actions_total{action="add_comment"} 4', text)
+
+    def test_files_of_exited_processes_folded(self):
+        """Сэмплы завершившегося процесса сохраняются в общем итоге."""
+        aggregate = os.path.join(TEMP_METRICS_DIR, AGGREGATE_FILE)
+        self.addCleanup(lambda: os.path.exists(aggregate)
+                        and os.remove(aggregate))
+        process = subprocess.Popen(['true'])
+        process.wait()
+        path = os.path.join(TEMP_METRICS_DIR, f'{process.pid}-0.json')
+        with open(path, 'w') as file:
+            json.dump([['yatube_actions_total', [['action', 'add_comment']],
+                        3]], file)
+        for _ in range(2):
+            self.assertIn('yatube_actions_total{action="add_comment"} 3',
+                          self.scrape())
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(
+            sorted(name for name in os.listdir(TEMP_METRICS_DIR)
+                   if name.endswith('.json')),
+            sorted([AGGREGATE_FILE, os.path.basename(registry.path())]),
+        )
+
+    def test_thumbnail_generation_counted(self):
+        """Генерация миниатюры увеличивает счётчик."""
+        small_gif = (b'\x47\x49\x46\x38\x39\x61\x02\x00'
+                     b'\x01\x00\x80\x00\x00\x00\x00\x00'
+                     b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+                     b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+                     b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+                     b'\x0A\x00\x3B')
+        post = Post.objects.create(
+            author=self.author, text="Пост",
+            image=SimpleUploadedFile('small.gif', small_gif, 'image/gif'),
+        )
+        generate_thumbnails(post.image)
+        self.assertIn(
+            'yatube_thumbnails_generated_total{geometry="960x500"} 2',
+            self.scrape(),
+        )
+
+    def test_metrics_hidden_from_outside(self):
+        """Страница метрик недоступна с внешних адресов."""
+        response = self.client.get(reverse("metrics"),
+                                   REMOTE_ADDR='203.0.113.5')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
@@ -0,0 +1,35 @@
+from django.contrib.auth import get_user_model
+from django.template.loader import render_to_string
+from django.test import TestCase
+
+from core.query_budget import inspect_queries
+from ..models import Comment, Post
+
+pytest_plugins = ['core.query_budget_plugin']
+
+User = get_user_model()
+
+
+def test_view_within_query_budget(budget_view, check_query_budget):
+    """Представление posts.urls или api.urls укладывается в бюджет."""
+    check_query_budget(budget_view)
+
+
+class RepeatedQueriesTest(TestCase):
+    def test_repeated_query_points_to_template_line(self):
+        """N+1 находится по форме запроса и указывает строку шаблона."""
+        author = User.objects.create(username="author")
+        post = Post.objects.create(author=author, text="Пост")
+        for i in range(5):
+            Comment.objects.create(
+                author=User.objects.create(username=f"user_{i}"),
+                post=post, text="Комментарий",
+            )
+        with inspect_queries() as log:
+            render_to_string("posts/includes/comment_list.html", {
+                "post": post, "comments": post.comments.all(),
+            })
+        [(shape, count, source)] = log.repeated(threshold=5)
+        self.assertIn('FROM "auth_user"', shape)
+        self.assertEqual(count, 5)
+        self.assertEqual(source, "posts/includes/comment_list.html:5")
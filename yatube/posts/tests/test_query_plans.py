@@ -0,0 +1,70 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class QueryPlanTests(TestCase):
+    """Основные запросы страниц не сканируют таблицу и не сортируют."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username="reader")
+        cls.author = User.objects.create(username="author")
+        cls.group = Group.objects.create(
+            title="Тестовая группа",
+            slug="test-slug",
+            description="Тестовое описание",
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        cls.post = Post.objects.create(
+            author=cls.author, text="Тестовый пост", group=cls.group
+        )
+        Comment.objects.create(
+            author=cls.user, post=cls.post, text="Комментарий"
+        )
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def main_query(self, url, table):
+        with CaptureQueriesContext(connection) as context:
+            self.authorized_client.get(url)
+        queries = [query['sql'] for query in context.captured_queries
+                   if f'FROM "{table}"' in query['sql']]
+        self.assertTrue(queries, f'{url} не обращается к таблице {table}')
+        ordered = [sql for sql in queries if 'ORDER BY' in sql]
+        return (ordered or queries)[0]
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def test_main_queries_use_indexes(self):
+        """EXPLAIN QUERY PLAN показывает поиск по индексу без temp B-tree."""
+        pages = [
+            (reverse("posts:index"), "posts_post"),
+            (reverse("posts:index") + "?page=2", "posts_post"),
+            (reverse("posts:group_list", kwargs={"slug": self.group.slug}),
+             "posts_post"),
+            (reverse("posts:profile", kwargs={"username": self.author}),
+             "posts_post"),
+            (reverse("posts:follow_index"), "posts_post"),
+            (reverse("posts:post_detail", kwargs={"post_id": self.post.id}),
+             "posts_comment"),
+        ]
+        for url, table in pages:
+            with self.subTest(url=url):
+                plan = self.explain(self.main_query(url, table))
+                for step in plan:
+                    self.assertNotIn('TEMP B-TREE', step)
+                    if step.startswith('SCAN'):
+                        self.assertIn('INDEX', step)
@@ -0,0 +1,100 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..checks import check_search_triggers
+from ..models import Post
+from ..search import (
+    FTS_TABLE, FTS_TRIGGERS, fts_query, fts_triggers, search_posts
+)
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username="author")
+        cls.admin = User.objects.create_superuser(
+            "admin", "admin@example.com", "password"
+        )
+        cls.cat = Post.objects.create(
+            author=cls.author, text="Кот спит на диване"
+        )
+        cls.cats = Post.objects.create(
+            author=cls.author, text="Котик и кот играют, кот <b>доволен</b>"
+        )
+        cls.dog = Post.objects.create(author=cls.author, text="Собака лает")
+
+    def test_query_syntax_is_escaped(self):
+        """Операторы FTS5 из ввода не попадают в запрос MATCH."""
+        self.assertEqual(fts_query('кот OR "пёс" NEAR(a'),
+                         '"кот"* "or" "пёс"* "near"* "a"')
+        self.assertIsNone(fts_query(' ?! '))
+
+    def test_results_ranked_and_highlighted(self):
+        """Результаты упорядочены по релевантности, совпадения выделены."""
+        posts, next_cursor = search_posts('кот')
+        self.assertEqual(posts, [self.cats, self.cat])
+        self.assertIsNone(next_cursor)
+        self.assertIn('<mark>Котик</mark>', posts[0].snippet)
+        self.assertIn('&lt;b&gt;доволен&lt;/b&gt;', posts[0].snippet)
+
+    @override_settings(ENTRIES_THE_PAGE=1)
+    def test_cursor_pagination(self):
+        """Курсор ведёт на следующую страницу без повторов."""
+        first, cursor = search_posts('кот')
+        second, last = search_posts('кот', cursor)
+        self.assertEqual(first + second, [self.cats, self.cat])
+        self.assertIsNone(last)
+
+    def test_index_follows_edits_and_deletes(self):
+        """Триггеры обновляют индекс при правке и удалении поста."""
+        Post.objects.filter(pk=self.dog.pk).update(text="Кот вместо собаки")
+        self.assertIn(self.dog, search_posts('кот')[0])
+        self.assertEqual(search_posts('собака')[0], [])
+        Post.objects.filter(pk=self.cat.pk).delete()
+        self.assertNotIn(self.cat, search_posts('кот')[0])
+
+    def test_triggers_checked(self):
+        """Проверка базы замечает пропавший триггер индекса."""
+        self.assertEqual(set(fts_triggers()), set(FTS_TRIGGERS))
+        self.assertEqual(check_search_triggers(None), [])
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER posts_post_fts_update')
+        self.assertEqual(
+            [warning.id for warning in check_search_triggers(None)],
+            ['posts.W001'],
+        )
+
+    def test_rebuild_command(self):
+        """Команда rebuild_search_index восстанавливает индекс."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('delete-all')"
+            )
+        self.assertEqual(search_posts('собака')[0], [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(search_posts('собака')[0], [self.dog])
+
+    def test_search_view(self):
+        """Страница поиска показывает найденные посты."""
+        response = Client().get(reverse('posts:search'), {'q': 'собака'})
+        self.assertEqual(list(response.context['posts']), [self.dog])
+        self.assertContains(response, '<mark>Собака</mark>')
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке находит посты через FTS5."""
+        client = Client()
+        client.force_login(self.admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'котик'}
+        )
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.cats]
+        )
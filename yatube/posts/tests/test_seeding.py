@@ -0,0 +1,113 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from ..counters import reconcile_counters
+from ..models import Comment, Follow, Group, Post, TimelineEntry, UserCounters
+from ..search import FTS_TABLE, fts_triggers
+from ..seeding import seed
+
+User = get_user_model()
+
+
+class SeedingTests(TestCase):
+    volumes = {
+        'users': 30, 'groups': 3, 'posts': 120, 'comments': 300,
+        'follows': 90,
+    }
+
+    def snapshot(self):
+        return (
+            list(Post.objects.order_by('pk').values_list(
+                'text', 'author__username', 'group__slug', 'pub_date',
+                'comments_count')),
+            list(Follow.objects.order_by('user', 'author').values_list(
+                'user__username', 'author__username')),
+            list(Comment.objects.order_by('pk').values_list(
+                'text', 'post_id', 'author_id')),
+        )
+
+    def clear(self):
+        for model in (User, Group):
+            model.objects.all().delete()
+
+    def test_seed_creates_requested_volumes(self):
+        """Команда seed_yatube создаёт заданное число строк."""
+        out = StringIO()
+        call_command('seed_yatube', chunk_size=50, stdout=out,
+                     **self.volumes)
+        self.assertIn('Добавлено строк: 543', out.getvalue())
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Post.objects.count(), 120)
+        self.assertEqual(Comment.objects.count(), 300)
+        self.assertEqual(Follow.objects.count(), 90)
+        self.assertEqual(UserCounters.objects.count(), 30)
+        self.assertTrue(TimelineEntry.objects.exists())
+
+    def test_counters_match_seeded_rows(self):
+        """Счётчики и ленты согласованы с вставленными строками."""
+        seed(chunk_size=50, **self.volumes)
+        self.assertEqual(reconcile_counters(), 0)
+        self.assertEqual(
+            sum(UserCounters.objects.values_list('posts_count', flat=True)),
+            120,
+        )
+        expected = sum(
+            Post.objects.filter(author_id=author).count()
+            for author in Follow.objects.values_list('author_id', flat=True)
+        )
+        self.assertEqual(TimelineEntry.objects.count(), expected)
+
+    def test_search_index_rebuilt_once(self):
+        """Посты попадают в индекс пересборкой, триггеры возвращаются."""
+        triggers = fts_triggers()
+        with CaptureQueriesContext(connection) as queries:
+            seed(chunk_size=50, **self.volumes)
+        self.assertEqual(fts_triggers(), triggers)
+        self.assertEqual(
+            sum('DROP TRIGGER' in query['sql'] for query in queries), 3
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) "
+                f"VALUES ('integrity-check', 1)"
+            )
+        post = Post.objects.create(author=User.objects.first(), text="Ёж")
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+                ['Ёж'],
+            )
+            self.assertEqual(cursor.fetchall(), [(post.pk,)])
+
+    def test_same_seed_same_data_with_workers(self):
+        """Одинаковое зерно даёт одинаковые данные при любом числе
+        процессов."""
+        seed(random_seed=7, chunk_size=40, **self.volumes)
+        first = self.snapshot()
+        self.clear()
+        seed(random_seed=7, chunk_size=40, workers=2, **self.volumes)
+        self.assertEqual(self.snapshot(), first)
+        self.clear()
+        seed(random_seed=8, chunk_size=40, **self.volumes)
+        self.assertNotEqual(self.snapshot(), first)
+
+
+class SeedingPragmaTests(TransactionTestCase):
+    def pragmas(self):
+        with connection.cursor() as cursor:
+            values = {}
+            for pragma in ('synchronous', 'cache_size', 'temp_store'):
+                cursor.execute(f'PRAGMA {pragma}')
+                values[pragma] = cursor.fetchone()[0]
+            return values
+
+    def test_sqlite_settings_restored(self):
+        """После наполнения соединение снова ждёт fsync."""
+        before = self.pragmas()
+        seed(users=3, groups=1, posts=5, comments=5, follows=2)
+        self.assertEqual(self.pragmas(), before)
@@ -0,0 +1,75 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.slow_queries import close_log
+from ..models import Post
+
+TEMP_LOG_DIR = tempfile.mkdtemp()
+SLOW_QUERY_LOG = os.path.join(TEMP_LOG_DIR, 'slow_queries.log')
+
+User = get_user_model()
+
+
+@override_settings(SLOW_QUERY_LOG=SLOW_QUERY_LOG, SLOW_QUERY_THRESHOLD_MS=0)
+class SlowQueryLogTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create(username="author")
+        Post.objects.create(author=author, text="Тестовый пост")
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        close_log()
+        shutil.rmtree(TEMP_LOG_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        close_log()
+        if os.path.exists(SLOW_QUERY_LOG):
+            os.remove(SLOW_QUERY_LOG)
+
+    def records(self):
+        with open(SLOW_QUERY_LOG, encoding='utf-8') as file:
+            return [json.loads(line) for line in file]
+
+    def test_slow_query_recorded_with_plan_and_source(self):
+        """В журнал попадают SQL, параметры, представление, шаблон и план."""
+        self.client.get(reverse("posts:index"))
+        feed = [record for record in self.records()
+                if 'FROM "posts_post"' in record['sql']
+                and 'ORDER BY' in record['sql']]
+        self.assertTrue(feed)
+        record = feed[0]
+        self.assertEqual(record['view'], 'posts:index')
+        self.assertEqual(record['source'], 'posts/index.html:14')
+        self.assertIsInstance(record['params'], list)
+        self.assertTrue(any('INDEX' in step for step in record['plan']))
+
+    def test_fast_queries_skipped(self):
+        """Запросы быстрее порога в журнал не пишутся."""
+        with self.settings(SLOW_QUERY_THRESHOLD_MS=10 ** 6):
+            self.client.get(reverse("posts:index"))
+        self.assertFalse(os.path.exists(SLOW_QUERY_LOG))
+
+    def test_command_summarizes_by_shape(self):
+        """slow_queries группирует записи по форме запроса."""
+        for _ in range(3):
+            cache.clear()
+            self.client.get(reverse("posts:index"))
+        out = StringIO()
+        call_command('slow_queries', sort='count', plans=True, stdout=out)
+        output = out.getvalue()
+        self.assertIn('3 раз', output)
+        self.assertIn('posts:index', output)
+        self.assertIn('SCAN', output)
@@ -0,0 +1,140 @@
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.http import Http404
+from django.test import RequestFactory, TestCase, override_settings
+
+from core.storage import is_content_addressed
+from core.views import media
+from ..models import Post
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
+
+SMALL_GIF = (b'\x47\x49\x46\x38\x39\x61\x02\x00'
+             b'\x01\x00\x80\x00\x00\x00\x00\x00'
+             b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+             b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+             b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+             b'\x0A\x00\x3B')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username="author")
+        cls.storage = Post._meta.get_field('image').storage
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, name, content=SMALL_GIF):
+        return Post.objects.create(
+            author=self.author, text="Пост",
+            image=SimpleUploadedFile(name, content, 'image/gif'),
+        )
+
+    def write_plain(self, name):
+        """Файл по обычному имени, как до хранилища по содержимому."""
+        path = self.storage.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(SMALL_GIF)
+
+    def publish(self, name='posts/small.gif', content=SMALL_GIF):
+        return self.storage.save(name, ContentFile(content))
+
+    def test_sharded_name_and_deduplication(self):
+        """Файл назван по sha256, одинаковые загрузки хранятся один раз."""
+        digest = hashlib.sha256(SMALL_GIF).hexdigest()
+        shards = f'{digest[:2]}/{digest[2:4]}'
+        first = self.create_post('Photo.GIF')
+        second = self.create_post('copy.gif')
+        other = self.create_post('other.gif', SMALL_GIF + b'\x00')
+        self.assertEqual(first.image.name,
+                         f'incoming/posts/{shards}/{digest}.gif')
+        self.assertEqual(second.image.name, first.image.name)
+        self.assertNotEqual(other.image.name, first.image.name)
+        self.assertEqual(
+            len(self.storage.listdir(f'incoming/posts/{shards}')[1]), 1
+        )
+        published = self.storage.save(first.image.name, first.image.file)
+        self.assertEqual(published, f'posts/{shards}/{digest}.gif')
+        resaved = self.publish(published, b'GIF')
+        self.assertRegex(resaved, r'^posts/\w\w/\w\w/\w{64}\.gif$')
+
+    def test_concurrent_identical_save(self):
+        """Файл, записанный параллельно, не получает имя с суффиксом."""
+        first = self.publish()
+        # Проверка имени прошла до того, как параллельный запрос
+        # дописал файл: запись упрётся в уже существующий.
+        with mock.patch.object(type(self.storage), 'exists',
+                               side_effect=[False, True]):
+            name = self.publish('posts/copy.gif')
+        self.assertEqual(name, first)
+
+    def test_immutable_cache_headers(self):
+        """Опубликованные файлы кешируются навсегда, загрузки не отдаются."""
+        staged = self.create_post('small.gif').image.name
+        plain = 'posts/plain.gif'
+        self.write_plain(plain)
+        request = RequestFactory().get('/media/')
+        for path in (staged, '/' + staged, 'posts/../' + staged):
+            with self.subTest(path=path), self.assertRaises(Http404):
+                media(request, path)
+        response = media(request, self.publish())
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn(f'max-age={settings.MEDIA_IMMUTABLE_MAX_AGE}',
+                      response['Cache-Control'])
+        self.assertFalse(media(request, plain).has_header('Cache-Control'))
+
+    def test_nginx_rule_matches_content_names(self):
+        """Правило immutable в deploy/nginx.conf совпадает с хранилищем."""
+        path = os.path.join(os.path.dirname(settings.BASE_DIR), 'deploy',
+                            'nginx.conf')
+        with open(path) as file:
+            rule = re.search(r'location ~ "(.+)"', file.read()).group(1)
+        self.assertRegex('/media/' + self.publish(), rule)
+        self.assertNotRegex('/media/cache/ab/cd/' + 'a' * 32 + '.jpg', rule)
+
+    def test_migrate_media(self):
+        """Команда переносит старые файлы и обновляет ссылки постов."""
+        old = 'posts/legacy.gif'
+        self.write_plain(old)
+        posts = [Post.objects.create(author=self.author, text="Пост")
+                 for _ in range(2)]
+        Post.objects.filter(pk__in=[post.pk for post in posts]).update(
+            image=old
+        )
+        with mock.patch('posts.management.commands.migrate_media'
+                        '.schedule_processing') as schedule:
+            call_command('migrate_media', stdout=StringIO())
+        names = set(Post.objects.filter(
+            pk__in=[post.pk for post in posts]
+        ).values_list('image', flat=True))
+        self.assertEqual(len(names), 1)
+        self.assertTrue(is_content_addressed(names.pop()))
+        self.assertEqual(schedule.call_count, 2)
+        # Закешированные страницы ещё ссылаются на старый файл.
+        self.assertTrue(self.storage.exists(old))
+        used = 'posts/used.gif'
+        self.write_plain(used)
+        Post.objects.filter(pk=posts[0].pk).update(image=used)
+        call_command('migrate_media', delete_old=True, stdout=StringIO())
+        self.assertFalse(self.storage.exists(old))
+        self.assertTrue(self.storage.exists(used))
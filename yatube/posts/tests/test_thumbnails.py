@@ -0,0 +1,152 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from ..models import Post
+from ..thumbnails import (
+    attach_thumbnails, cached_renditions, cached_thumbnail,
+    generate_thumbnails, renditions
+)
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
+
+SMALL_GIF = (b'\x47\x49\x46\x38\x39\x61\x02\x00'
+             b'\x01\x00\x80\x00\x00\x00\x00\x00'
+             b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+             b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+             b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+             b'\x0A\x00\x3B')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username="author")
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def create_post(self, name='small.gif', content=SMALL_GIF):
+        return Post.objects.create(
+            author=self.author, text="Пост",
+            image=SimpleUploadedFile(name, content, 'image/gif'),
+        )
+
+    def test_render_shows_placeholder_without_generating(self):
+        """До генерации страница показывает заглушку и не ресайзит."""
+        post = self.create_post()
+        with mock.patch('posts.thumbnails.ThumbnailBackend'
+                        '._create_thumbnail') as create:
+            response = self.client.get(
+                reverse('posts:post_detail', kwargs={'post_id': post.pk})
+            )
+        create.assert_not_called()
+        self.assertContains(response, 'Изображение обрабатывается')
+
+    def test_generated_thumbnails_rendered(self):
+        """После генерации шаблоны показывают готовые миниатюры."""
+        post = self.create_post()
+        generate_thumbnails(post.image)
+        for size in settings.POST_THUMBNAILS:
+            self.assertIsNotNone(cached_thumbnail(post.image, size))
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(
+            response, cached_thumbnail(post.image, 'card').url
+        )
+
+    def test_saving_image_schedules_generation(self):
+        """Новая картинка ставит обработку в очередь, правка текста — нет."""
+        with mock.patch('posts.uploads.schedule_processing') as schedule:
+            post = self.create_post()
+            post.text = "Новый текст"
+            post.save()
+            Post.objects.create(author=self.author, text="Без картинки")
+        schedule.assert_called_once_with(post)
+
+    def test_post_create_schedules_generation(self):
+        """post_create откладывает генерацию до коммита транзакции."""
+        with mock.patch('tasks.queue.transaction.on_commit') as commit:
+            self.client.post(reverse('posts:post_create'), {
+                'text': "Пост с картинкой",
+                'image': SimpleUploadedFile('new.gif', SMALL_GIF,
+                                            'image/gif'),
+            })
+        commit.assert_called_once()
+
+    def test_backfill_command(self):
+        """Команда generate_thumbnails догоняет старые картинки."""
+        post = self.create_post()
+        call_command('generate_thumbnails', stdout=StringIO())
+        self.assertIsNotNone(cached_thumbnail(post.image, 'detail'))
+
+    def test_page_thumbnails_resolved_in_one_lookup(self):
+        """Миниатюры страницы ищутся одним запросом, а не по одной."""
+        # Разное содержимое: одинаковые файлы хранятся под одним именем.
+        posts = [self.create_post(f'image{i}.gif', SMALL_GIF + bytes([i]))
+                 for i in range(3)]
+        for post in posts[:2]:
+            generate_thumbnails(post.image)
+        posts.append(Post.objects.create(author=self.author, text="Текст"))
+        cache.clear()
+        with self.assertNumQueries(1):
+            attach_thumbnails(posts, 'card')
+        with self.assertNumQueries(0):
+            attach_thumbnails(posts, 'card')
+        names = [getattr(post.thumbnails['card'], 'name', None)
+                 for post in posts]
+        self.assertEqual(names[1:], [
+            cached_thumbnail(posts[1].image, 'card').name, None, None
+        ])
+        self.assertEqual(names[0], cached_thumbnail(posts[0].image,
+                                                    'card').name)
+
+    @override_settings(POST_RENDITION_WIDTHS=(320, 640, 1200),
+                       POST_RENDITION_FORMATS=('WEBP', 'JPEG'))
+    def test_rendition_ladder(self):
+        """Копии не шире размера, в тех же пропорциях и форматах Pillow."""
+        with mock.patch.dict(Image.SAVE):
+            Image.SAVE.pop('WEBP', None)
+            ladder = renditions('card')
+        self.assertEqual(
+            [(name, geometry) for name, geometry, _ in ladder],
+            [('JPEG', '320x167'), ('JPEG', '640x333'), ('JPEG', '960x500')],
+        )
+
+    def test_picture_srcset(self):
+        """Картинка выводится с srcset всех копий и явными размерами."""
+        post = self.create_post()
+        generate_thumbnails(post.image)
+        jpegs = cached_renditions(post.image, 'card')['JPEG']
+        self.assertEqual([jpeg.width for jpeg in jpegs], [320, 480, 640, 960])
+        response = self.client.get(reverse('posts:index'))
+        srcset = ', '.join(f'{jpeg.url} {jpeg.width}w' for jpeg in jpegs)
+        self.assertContains(response, f'srcset="{srcset}"')
+        self.assertContains(response, 'width="960" height="500" '
+                                      'loading="lazy" decoding="async"')
+        with self.assertNumQueries(0):
+            attach_thumbnails([post], 'card')
+        self.assertEqual(
+            [jpeg.name for jpeg in post.renditions['card']['JPEG']],
+            [jpeg.name for jpeg in jpegs],
+        )
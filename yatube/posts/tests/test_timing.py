@@ -0,0 +1,73 @@
+import json
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import timing as timing_module
+from ..models import Post
+
+User = get_user_model()
+
+
+class ServerTimingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create(username="author")
+        Post.objects.create(author=author, text="Тестовый пост")
+
+    def setUp(self):
+        cache.clear()
+
+    def metrics(self, response):
+        return dict(re.findall(
+            r'(\w+);(?:dur=[\d.]+;)?desc="([^"]*)"',
+            response['Server-Timing'],
+        ))
+
+    def test_header_reports_queries_templates_and_cache(self):
+        """Server-Timing содержит SQL, шаблоны, кеш и общее время."""
+        response = self.client.get(reverse("posts:index"))
+        header = response['Server-Timing']
+        for name in ('db;dur=', 'tpl;dur=', 'cache;dur=', 'total;dur='):
+            with self.subTest(name=name):
+                self.assertIn(name, header)
+        self.assertNotEqual(self.metrics(response)['db'], '0 queries')
+
+    def test_cached_page_counts_cache_hits(self):
+        """Повторный запрос попадает в кеш и не ходит в базу."""
+        self.client.get(reverse("posts:index"))
+        response = self.client.get(reverse("posts:index"))
+        metrics = self.metrics(response)
+        self.assertEqual(metrics['db'], '0 queries')
+        self.assertRegex(metrics['cache'], r'hits=[1-9]')
+
+    def test_cache_batches_counted_once(self):
+        """get_many и set_many считаются по ключам, без вложенных get/set."""
+        timing = timing_module.RequestTiming()
+        token = timing_module._current.set(timing)
+        try:
+            cache.set('first', 1)
+            cache.set_many({'second': 2, 'third': 3})
+            found = cache.get_many(['first', 'second', 'missing'])
+        finally:
+            timing_module._current.reset(token)
+        self.assertEqual(found, {'first': 1, 'second': 2})
+        self.assertEqual(
+            (timing.cache_hits, timing.cache_misses, timing.cache_sets),
+            (2, 1, 3),
+        )
+        self.assertGreater(timing.cache, 0)
+
+    @override_settings(TIMING_LOG_SAMPLE_RATE=1)
+    def test_sampled_log_line_has_url_name(self):
+        """В структурированный лог попадает имя маршрута."""
+        with self.assertLogs('yatube.timing', 'INFO') as logs:
+            self.client.get(reverse("posts:index"))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'posts:index')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['queries'], 0)
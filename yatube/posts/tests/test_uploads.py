@@ -0,0 +1,167 @@
+import os
+import shutil
+import tempfile
+import time
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from core.storage import is_content_addressed, is_staged
+from ..models import Post
+from ..tasks import discard_image, process_post_image
+from ..uploads import process_original
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
+
+SMALL_GIF = (b'\x47\x49\x46\x38\x39\x61\x02\x00'
+             b'\x01\x00\x80\x00\x00\x00\x00\x00'
+             b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+             b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+             b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+             b'\x0A\x00\x3B')
+
+
+def photo():
+    """JPEG 300x200 с EXIF: камера и поворот на 90° по часовой."""
+    exif = Image.Exif()
+    exif[0x010F] = 'Camera'
+    exif[0x0112] = 6
+    output = BytesIO()
+    Image.new('RGB', (300, 200), 'red').save(output, 'JPEG',
+                                             exif=exif.tobytes())
+    return output.getvalue()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class UploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username="author")
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def upload(self, name, content):
+        return self.client.post(reverse('posts:post_create'), {
+            'text': "Пост с картинкой",
+            'image': SimpleUploadedFile(name, content),
+        })
+
+    def test_rejected_by_header(self):
+        """Слишком большие и чужого формата картинки не принимаются."""
+        bmp = BytesIO()
+        Image.new('RGB', (2, 1)).save(bmp, 'BMP')
+        cases = {
+            'too_many_pixels': ({'POST_IMAGE_MAX_PIXELS': 1}, SMALL_GIF),
+            'file_too_large': ({'FILE_UPLOAD_MAX_SIZE': 16}, SMALL_GIF),
+            'unsupported_format': ({}, bmp.getvalue()),
+        }
+        for code, (limits, content) in cases.items():
+            with self.subTest(code=code), override_settings(**limits):
+                response = self.upload('image', content)
+                self.assertTrue(
+                    response.context['form'].has_error('image', code)
+                )
+        self.assertFalse(Post.objects.exists())
+
+    def test_original_downscaled_without_metadata(self):
+        """Оригинал повёрнут по EXIF, уменьшен и сохранён без метаданных."""
+        with mock.patch('posts.uploads.schedule_processing'):
+            self.upload('photo.jpg', photo())
+        post = Post.objects.get()
+        original = post.image.name
+        detail = reverse('api:post_detail', kwargs={'post_id': post.pk})
+        self.assertIsNone(self.client.get(detail).json()['image'])
+        with override_settings(POST_IMAGE_MAX_SIDE=150), mock.patch(
+                'posts.tasks.generate_post_thumbnails') as thumbnails, \
+                mock.patch('posts.tasks.enqueue') as enqueue:
+            process_post_image(post.pk)
+        thumbnails.assert_called_once_with(post.pk)
+        enqueue.assert_called_once_with(
+            discard_image, args=[original],
+            delay=settings.POST_IMAGE_DISCARD_DELAY,
+        )
+        post.refresh_from_db()
+        self.assertNotEqual(post.image.name, original)
+        self.assertTrue(is_content_addressed(post.image.name))
+        self.assertFalse(is_staged(post.image.name))
+        self.assertEqual(self.client.get(detail).json()['image'],
+                         post.image.url)
+        # Оригинал удаляет отложенная задача, а не обработка.
+        self.assertTrue(post.image.storage.exists(original))
+        with Image.open(post.image) as image:
+            self.assertEqual(image.size, (100, 150))
+            self.assertEqual(len(image.getexif()), 0)
+
+    def test_animation_downscaled_without_comment(self):
+        """У анимации уменьшен каждый кадр и убран комментарий."""
+        frames = [Image.new('P', (300, 200), color) for color in (1, 2)]
+        output = BytesIO()
+        frames[0].save(output, 'GIF', save_all=True,
+                       append_images=frames[1:], duration=[50, 70],
+                       comment=b'secret')
+        post = Post.objects.create(
+            author=self.author, text="Пост",
+            image=SimpleUploadedFile('anim.gif', output.getvalue()),
+        )
+        with override_settings(POST_IMAGE_MAX_SIDE=150):
+            published = process_original(post.image)
+        with post.image.storage.open(published) as file:
+            content = file.read()
+        self.assertNotIn(b'secret', content)
+        with Image.open(BytesIO(content)) as image:
+            self.assertEqual((image.n_frames, image.size), (2, (150, 100)))
+            image.seek(1)
+            self.assertEqual(image.info['duration'], 70)
+
+    def test_clean_small_image_published_as_is(self):
+        """Маленькая картинка без метаданных публикуется без изменений."""
+        post = Post.objects.create(
+            author=self.author, text="Пост",
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        )
+        self.assertTrue(is_staged(post.image.name))
+        published = process_original(post.image)
+        self.assertFalse(is_staged(published))
+        with post.image.storage.open(published) as file:
+            self.assertEqual(file.read(), SMALL_GIF)
+        post.image.name = published
+        self.assertIsNone(process_original(post.image))
+
+    def test_discard_rechecks_before_delete(self):
+        """Оригинал удаляется, только если он не нужен и не загружался."""
+        with mock.patch('posts.uploads.schedule_processing'):
+            self.upload('small.gif', SMALL_GIF)
+        post = Post.objects.get()
+        storage = post.image.storage
+        name = post.image.name
+        path = storage.path(name)
+        old = time.time() - settings.POST_IMAGE_DISCARD_DELAY - 60
+        os.utime(path, (old, old))
+        discard_image(name)
+        self.assertTrue(storage.exists(name))
+        Post.objects.update(image='')
+        # Тот же файл загрузили снова, пост ещё не закоммичен.
+        storage.save('posts/small.gif', SimpleUploadedFile('small.gif',
+                                                           SMALL_GIF))
+        discard_image(name)
+        self.assertTrue(storage.exists(name))
+        os.utime(path, (old, old))
+        discard_image(name)
+        self.assertFalse(storage.exists(name))
+        discard_image(name)
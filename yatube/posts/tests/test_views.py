@@ -1,11 +1,16 @@
 from django.core.cache import cache
+from django.core.paginator import Paginator
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.conf import settings
 from django import forms
 
-from ..models import Group, Post, Follow
+from ..models import Comment, Group, Post, Follow
+from ..utils import CursorPaginator, encode_cursor
+from core.templatetags.paginator_tags import page_window
 
 OBJECTS_TWO_PAGES = settings.ENTRIES_THE_PAGE // 2
 TEST_OF_POST = settings.ENTRIES_THE_PAGE + OBJECTS_TWO_PAGES
@@ -170,7 +175,7 @@ class PostURLTests(TestCase):
         """Проверка кеша."""
         response = self.authorized_client.get(reverse("posts:index"))
         r_1 = response.content
-        Post.objects.get(id=self.post.id).delete()
+        Post.objects.filter(id=self.post.id).update(text="Без сигналов")
         response2 = self.authorized_client.get(reverse("posts:index"))
         r_2 = response2.content
         cache.clear()
@@ -179,6 +184,41 @@ class PostURLTests(TestCase):
         self.assertEqual(r_1, r_2)
         self.assertNotEqual(r_2, r_3)
 
+    def test_cached_feed_does_not_query_posts(self):
+        """Лента из кеша фрагментов не обращается к таблице постов."""
+        self.authorized_client.get(reverse("posts:index"))
+        with CaptureQueriesContext(connection) as context:
+            self.authorized_client.get(reverse("posts:index"))
+        for query in context.captured_queries:
+            self.assertNotIn('FROM "posts_post"', query['sql'])
+
+    def test_cache_invalidated_by_post_changes(self):
+        """Кеш лент сбрасывается при создании, правке и удалении поста."""
+        urls = (
+            reverse("posts:index"),
+            reverse("posts:group_list", kwargs={"slug": self.group.slug}),
+            reverse("posts:profile", kwargs={"username": self.post.author}),
+        )
+        for url in urls:
+            self.authorized_client.get(url)
+        post = Post.objects.create(
+            author=self.user, text="Новый пост", group=self.group
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.authorized_client.get(url),
+                                    "Новый пост")
+        post.text = "Исправленный пост"
+        post.group = self.group2
+        post.save()
+        response = self.authorized_client.get(urls[1])
+        self.assertNotContains(response, "Исправленный пост")
+        self.assertContains(self.authorized_client.get(urls[0]),
+                            "Исправленный пост")
+        post.delete()
+        self.assertNotContains(self.authorized_client.get(urls[0]),
+                               "Исправленный пост")
+
     def test_follow_author_post(self):
         """Проверка подписки на автора поста."""
         following_user = User.objects.create(username="following")
@@ -251,3 +291,122 @@ class PaginatorViewsTest(TestCase):
                 response = self.authorized_client.get(adress + '?page=2')
                 self.assertEqual(len(response.context["page_obj"]),
                                  OBJECTS_TWO_PAGES)
+
+    def test_cursor_pages_walk_whole_feed(self):
+        """Курсорная пагинация проходит ленту без повторов и пропусков."""
+        for adress in self.reverse_adress:
+            with self.subTest(adress):
+                response = self.authorized_client.get(adress)
+                first_page = response.context["page_obj"]
+                response = self.authorized_client.get(
+                    adress + '?after=' + first_page.next_cursor
+                )
+                second_page = response.context["page_obj"]
+                self.assertEqual(len(second_page), OBJECTS_TWO_PAGES)
+                self.assertFalse(second_page.has_next())
+                seen = list(first_page) + list(second_page)
+                self.assertEqual(len(set(seen)), TEST_OF_POST)
+                response = self.authorized_client.get(
+                    adress + '?before=' + second_page.previous_cursor
+                )
+                self.assertEqual(list(response.context["page_obj"]),
+                                 list(first_page))
+                self.assertFalse(response.context["page_obj"].has_previous())
+
+    def test_empty_page_has_no_previous_link(self):
+        """За концом ленты нет ссылки «Предыдущая» без курсора."""
+        last = Post.objects.order_by('pub_date', 'id').first()
+        for query in ('?page=5', '?after=' + encode_cursor(last)):
+            with self.subTest(query=query):
+                response = self.authorized_client.get(
+                    reverse("posts:index") + query
+                )
+                page_obj = response.context["page_obj"]
+                self.assertEqual(len(page_obj), 0)
+                self.assertFalse(page_obj.has_previous())
+                self.assertNotContains(response, 'before=None')
+
+    def test_cursor_page_does_not_count_posts(self):
+        """Курсорная страница не выполняет COUNT по всей таблице."""
+        response = self.authorized_client.get(reverse("posts:index"))
+        token = response.context["page_obj"].next_cursor
+        with self.assertNumQueries(1):
+            page_obj = CursorPaginator(
+                Post.objects.all(), settings.ENTRIES_THE_PAGE
+            ).get_cursor_page(after=token)
+            self.assertEqual(len(page_obj), OBJECTS_TWO_PAGES)
+
+    def test_page_window_is_bounded(self):
+        """Навигация показывает окно страниц с многоточиями."""
+        paginator = Paginator(range(500000), settings.ENTRIES_THE_PAGE)
+        cases = [
+            (1, [1, 2, 3, None, 50000]),
+            (250, [1, None, 248, 249, 250, 251, 252, None, 50000]),
+            (50000, [1, None, 49998, 49999, 50000]),
+        ]
+        for number, expected in cases:
+            with self.subTest(number=number):
+                self.assertEqual(page_window(paginator.page(number)),
+                                 expected)
+
+    def test_page_window_for_cursor_pages(self):
+        """У курсорной страницы нет последней страницы в навигации."""
+        paginator = CursorPaginator(Post.objects.all(),
+                                    settings.ENTRIES_THE_PAGE)
+        self.assertEqual(page_window(paginator.get_cursor_page(number=1)),
+                         [1, 2])
+        self.assertEqual(page_window(paginator.get_cursor_page(number=2)),
+                         [1, 2])
+        token = paginator.get_cursor_page().next_cursor
+        self.assertEqual(page_window(paginator.get_cursor_page(after=token)),
+                         [])
+
+
+class CommentsViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username="auth")
+        cls.post = Post.objects.create(author=cls.author, text="Пост")
+        cls.total = settings.COMMENTS_THE_PAGE + 5
+        for i in range(cls.total):
+            user = User.objects.create(username=f"user_{i}")
+            Comment.objects.create(author=user, post=cls.post,
+                                   text=f"Комментарий {i}")
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_detail_shows_first_batch(self):
+        """На странице поста только первая порция комментариев."""
+        response = self.client.get(
+            reverse("posts:post_detail", kwargs={"post_id": self.post.id})
+        )
+        self.assertEqual(len(response.context["comments"]),
+                         settings.COMMENTS_THE_PAGE)
+        self.assertIsNotNone(response.context["next_cursor"])
+
+    def test_load_more_returns_next_batch(self):
+        """Фрагмент «показать ещё» отдаёт оставшиеся комментарии."""
+        response = self.client.get(
+            reverse("posts:post_detail", kwargs={"post_id": self.post.id})
+        )
+        seen = list(response.context["comments"])
+        response = self.client.get(
+            reverse("posts:post_comments", kwargs={"post_id": self.post.id}),
+            {"after": response.context["next_cursor"]},
+        )
+        self.assertTemplateUsed(response, "posts/includes/comment_list.html")
+        self.assertIsNone(response.context["next_cursor"])
+        seen += list(response.context["comments"])
+        self.assertEqual([comment.text for comment in seen],
+                         [f"Комментарий {i}" for i in range(self.total)])
+
+    def test_comments_do_not_query_per_author(self):
+        """Авторы комментариев загружаются одним запросом с комментариями."""
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(reverse("posts:post_comments",
+                                    kwargs={"post_id": self.post.id}))
+        user_queries = [query for query in context.captured_queries
+                        if query['sql'].startswith('SELECT "auth_user"')]
+        self.assertEqual(user_queries, [])
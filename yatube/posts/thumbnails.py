@@ -0,0 +1,176 @@
+"""Миниатюры картинок постов.
+
+Все размеры, которые используют шаблоны, перечислены в
+settings.POST_THUMBNAILS. Они генерируются заранее, после сохранения
+поста, задачей фоновой очереди; шаблон же только читает готовую
+миниатюру из хранилища sorl и до её появления показывает заглушку.
+Вместе с каждым размером генерируются его уменьшенные копии для
+srcset (POST_RENDITION_WIDTHS в форматах POST_RENDITION_FORMATS).
+"""
+from operator import attrgetter
+
+from django.conf import settings
+from PIL import Image
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import ThumbnailBackend as BaseThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import (
+    EMPTY_VALUE, KVStore as CachedDBKVStore
+)
+from sorl.thumbnail.models import KVStore
+
+from core import metrics
+
+
+class ThumbnailBackend(BaseThumbnailBackend):
+    """Бэкенд sorl-thumbnail, считающий сгенерированные миниатюры."""
+
+    def _create_thumbnail(self, source_image, geometry_string, options,
+                          thumbnail):
+        super()._create_thumbnail(source_image, geometry_string, options,
+                                  thumbnail)
+        metrics.THUMBNAILS.inc(geometry=geometry_string)
+
+    def thumbnail_file(self, file_, geometry_string, **options):
+        """ImageFile миниатюры с тем же именем, что даст get_thumbnail."""
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def cached_thumbnail(self, file_, geometry_string, **options):
+        """Готовая миниатюра из хранилища sorl или None, без генерации."""
+        thumbnail = self.thumbnail_file(file_, geometry_string, **options)
+        return default.kvstore.get(thumbnail)
+
+
+def cached_thumbnail(image, size):
+    geometry, options = settings.POST_THUMBNAILS[size]
+    return default.backend.cached_thumbnail(image, geometry, **options)
+
+
+def rendition_formats():
+    """Форматы из POST_RENDITION_FORMATS, которые умеет кодировать Pillow."""
+    Image.init()
+    return [name for name in settings.POST_RENDITION_FORMATS
+            if name in Image.SAVE]
+
+
+def renditions(size):
+    """(формат, геометрия, опции) всех копий размера size для srcset.
+
+    Ширины берутся из POST_RENDITION_WIDTHS меньше ширины размера плюс
+    сама эта ширина, высота — в тех же пропорциях.
+    """
+    geometry, options = settings.POST_THUMBNAILS[size]
+    width, height = map(int, geometry.split('x'))
+    widths = sorted({width, *(
+        value for value in settings.POST_RENDITION_WIDTHS if value < width
+    )})
+    return [
+        (name, f'{value}x{round(height * value / width)}',
+         {**options, 'format': name})
+        for name in rendition_formats() for value in widths
+    ]
+
+
+def _lookup(files):
+    """Готовые миниатюры для словаря {ключ: ImageFile} или None.
+
+    Вместо обращения к хранилищу sorl на каждую миниатюру делается
+    один cache.get_many и не больше одного запроса к базе за
+    промахами.
+    """
+    if not isinstance(default.kvstore, CachedDBKVStore):
+        return {key: default.kvstore.get(thumbnail)
+                for key, thumbnail in files.items()}
+    keys = {key: add_prefix(thumbnail.key)
+            for key, thumbnail in files.items()}
+    kv_cache = default.kvstore.cache
+    values = kv_cache.get_many(set(keys.values()))
+    missing = set(keys.values()) - values.keys()
+    if missing:
+        found = dict(KVStore.objects.filter(key__in=missing).values_list(
+            'key', 'value'
+        ))
+        # Как и sorl, запоминаем в кеше и отсутствие записи.
+        fetched = {key: found.get(key, EMPTY_VALUE) for key in missing}
+        kv_cache.set_many(fetched, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT)
+        values.update(fetched)
+    return {
+        key: deserialize_image_file(values[kv_key])
+        if values[kv_key] and values[kv_key] != EMPTY_VALUE else None
+        for key, kv_key in keys.items()
+    }
+
+
+def _files(image, size):
+    """ImageFile миниатюры size (ключ None) и её копий (формат, геометрия)."""
+    geometry, options = settings.POST_THUMBNAILS[size]
+    files = {None: default.backend.thumbnail_file(image, geometry, **options)}
+    for name, rendition, rendition_options in renditions(size):
+        files[name, rendition] = default.backend.thumbnail_file(
+            image, rendition, **rendition_options
+        )
+    return files
+
+
+def _by_format(found):
+    sources = {}
+    for key, thumbnail in found.items():
+        if key is not None and thumbnail is not None:
+            sources.setdefault(key[0], []).append(thumbnail)
+    for files in sources.values():
+        files.sort(key=attrgetter('width'))
+    return sources
+
+
+def cached_renditions(image, size):
+    """Готовые копии для srcset: {формат: [ImageFile от узких к широким]}."""
+    return _by_format(_lookup(_files(image, size)))
+
+
+def attach_thumbnails(posts, size):
+    """Находит миниатюры size и их копии для srcset у всех постов разом.
+
+    Результат кладётся в post.thumbnails[size] (None, если миниатюры
+    ещё нет) и post.renditions[size] — как у cached_renditions.
+    Возвращает посты списком.
+    """
+    posts = list(posts)
+    own, files = {}, {}
+    for post in posts:
+        if not hasattr(post, 'thumbnails'):
+            post.thumbnails, post.renditions = {}, {}
+        post.thumbnails[size], post.renditions[size] = None, {}
+        if post.image:
+            own[post.pk] = _files(post.image, size)
+            files.update(((post.pk, key), thumbnail)
+                         for key, thumbnail in own[post.pk].items())
+    if not files:
+        return posts
+    found = _lookup(files)
+    for post in posts:
+        if post.pk in own:
+            thumbnails = {key: found[post.pk, key] for key in own[post.pk]}
+            post.thumbnails[size] = thumbnails[None]
+            post.renditions[size] = _by_format(thumbnails)
+    return posts
+
+
+def generate_thumbnails(image):
+    """Генерирует все размеры из POST_THUMBNAILS и их копии для srcset."""
+    for size, (geometry, options) in settings.POST_THUMBNAILS.items():
+        get_thumbnail(image, geometry, **options)
+        for _, rendition, rendition_options in renditions(size):
+            get_thumbnail(image, rendition, **rendition_options)
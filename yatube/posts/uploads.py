@@ -0,0 +1,137 @@
+"""Приём и обработка картинок постов.
+
+В запросе картинка не декодируется: формат, размер файла и число
+пикселей известны из заголовка, а forms.ImageField ещё вызывает
+Image.verify(), который читает файл, но не распаковывает пиксели.
+Загрузка сохраняется в закрытый каталог хранилища (core.storage).
+Тяжёлая часть — декодирование, поворот по EXIF, уменьшение и
+пересохранение без метаданных — идёт в фоновой очереди; только её
+результат публикуется, после чего генерируются миниатюры.
+"""
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, ImageSequence
+
+from core.storage import is_staged
+from tasks.queue import enqueue
+
+PROCESSING_PRIORITY = 10
+# Ключи Image.info с метаданными, которые не должны попасть в файл.
+METADATA_KEYS = {'exif', 'xmp', 'XML:com.adobe.xmp', 'comment',
+                 'photoshop'}
+
+
+def check_dimensions(size):
+    width, height = size
+    if width * height > settings.POST_IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Картинка слишком большая: не больше %(limit)d Мп.',
+            code='too_many_pixels',
+            params={'limit': settings.POST_IMAGE_MAX_PIXELS // 10 ** 6},
+        )
+
+
+def validate_upload_size(file):
+    # Сверх лимита файл не дописан на диск (CappedTemporaryFileUploadHandler),
+    # поэтому размер нужно проверить до того, как его откроет Pillow.
+    if getattr(file, 'size', 0) > settings.FILE_UPLOAD_MAX_SIZE:
+        raise ValidationError(
+            'Файл слишком большой: не больше %(limit)d МБ.',
+            code='file_too_large',
+            params={'limit': settings.FILE_UPLOAD_MAX_SIZE // 2 ** 20},
+        )
+
+
+def validate_image_upload(file):
+    """Валидатор загруженной картинки для forms.ImageField.
+
+    ImageField к этому моменту уже открыл картинку и вызвал verify():
+    файл прочитан, но пиксели не распакованы.
+    """
+    validate_upload_size(file)
+    image = getattr(file, 'image', None)
+    if image is None:
+        return
+    if image.format not in settings.POST_IMAGE_FORMATS:
+        raise ValidationError(
+            'Формат %(format)s не поддерживается.',
+            code='unsupported_format', params={'format': image.format},
+        )
+    check_dimensions(image.size)
+
+
+def _needs_processing(image):
+    return bool(
+        max(image.size) > settings.POST_IMAGE_MAX_SIDE
+        or METADATA_KEYS & image.info.keys()
+        or len(image.getexif())
+    )
+
+
+def _strip_metadata(picture):
+    # Прозрачность и цветовой профиль тоже лежат в info: их оставляем.
+    picture.info = {key: value for key, value in picture.info.items()
+                    if key not in METADATA_KEYS}
+    return picture
+
+
+def _process_animation(source, limit):
+    """Анимация с уменьшенными кадрами без метаданных."""
+    frames, durations = [], []
+    for frame in ImageSequence.Iterator(source):
+        durations.append(frame.info.get('duration', 100))
+        picture = ImageOps.exif_transpose(frame.copy())
+        picture.thumbnail((limit, limit), Image.LANCZOS)
+        frames.append(_strip_metadata(picture))
+    output = BytesIO()
+    frames[0].save(output, format=source.format, save_all=True,
+                   append_images=frames[1:], duration=durations,
+                   loop=source.info.get('loop', 0), exif=b'')
+    return output
+
+
+def _process_picture(source, limit):
+    """Картинка, повёрнутая по EXIF и уменьшенная, без метаданных."""
+    image_format = source.format
+    # JPEG декодируется сразу в уменьшенном масштабе, не целиком.
+    source.draft(source.mode, (limit, limit))
+    picture = ImageOps.exif_transpose(source)
+    picture.thumbnail((limit, limit), Image.LANCZOS)
+    _strip_metadata(picture)
+    output = BytesIO()
+    picture.save(output, format=image_format, exif=b'',
+                 quality=settings.POST_IMAGE_QUALITY, optimize=True,
+                 icc_profile=picture.info.get('icc_profile'))
+    return output
+
+
+def process_original(image):
+    """Уменьшает оригинал, убирает метаданные и публикует результат.
+
+    Возвращает опубликованное имя файла в хранилище или None, если
+    картинка уже опубликована, не больше POST_IMAGE_MAX_SIDE и без
+    метаданных. У анимаций уменьшается каждый кадр.
+    """
+    limit = settings.POST_IMAGE_MAX_SIDE
+    with image.open('rb'), Image.open(image) as source:
+        check_dimensions(source.size)
+        if not _needs_processing(source):
+            if not is_staged(image.name):
+                return None
+            return image.storage.save(image.name, File(image.file))
+        if getattr(source, 'n_frames', 1) > 1:
+            output = _process_animation(source, limit)
+        else:
+            output = _process_picture(source, limit)
+    return image.storage.save(image.name, ContentFile(output.getvalue()))
+
+
+def schedule_processing(post):
+    """Ставит обработку картинки поста в очередь после коммита."""
+    enqueue('posts.process_image', args=[post.pk],
+            priority=PROCESSING_PRIORITY,
+            key=f'image:{post.pk}:{post.image.name}')
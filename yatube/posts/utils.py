@@ -1,9 +1,235 @@
-from django.core.paginator import Paginator
+import base64
+import binascii
+import heapq
+from datetime import datetime
+from itertools import islice
+
+from django.core.paginator import Page, Paginator
 from django.conf import settings
+from django.db.models import Q
+from django.utils.functional import SimpleLazyObject
+
+CURSOR_DATE_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
+
+def encode_position(moment, pk):
+    """Кодирует позицию (дата, id) в непрозрачный токен."""
+    raw = f'{moment.strftime(CURSOR_DATE_FORMAT)}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def encode_cursor(obj, field='pub_date'):
+    """Кодирует позицию записи (дата, id) в непрозрачный токен."""
+    return encode_position(getattr(obj, field), obj.pk)
+
+
+def decode_cursor(token):
+    """Возвращает (дата, id) из токена или None, если токен испорчен."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        pub_date, pk = raw.decode().split('|')
+        return datetime.strptime(pub_date, CURSOR_DATE_FORMAT), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def cursor_source(queryset, date='pub_date', pk='id', where=None):
+    """Источник для seek(): queryset и поля (дата, id) его порядка."""
+    return queryset, date, pk, Q(**(where or {}))
+
+
+def seek(source, cursor, newest_first=True):
+    """Источник, упорядоченный по (date, pk) и начатый после cursor.
+
+    Условия where и курсора идут в один filter(): для многозначной
+    связи (например, timeline_entries) отдельные вызовы filter() дали
+    бы отдельные JOIN, и курсор сравнивался бы с чужими строками.
+    """
+    queryset, date, pk, where = source
+    sign = '-' if newest_first else ''
+    queryset = queryset.order_by(f'{sign}{date}', f'{sign}{pk}')
+    if cursor is not None:
+        moment, last = cursor
+        compare = 'lt' if newest_first else 'gt'
+        where &= (
+            Q(**{f'{date}__{compare}': moment})
+            | Q(**{date: moment, f'{pk}__{compare}': last})
+        )
+    return queryset.filter(where)
+
+
+def merge_sources(sources, cursor, limit, newest_first=True):
+    """Не больше limit записей после cursor, слитых из всех источников.
+
+    Из каждого источника берётся не больше limit строк. Запросы
+    выполняются при первом обращении к результату.
+    """
+    rows = [seek(source, cursor, newest_first)[:limit] for source in sources]
+    if len(rows) == 1:
+        return rows[0]
+    return islice(heapq.merge(
+        *rows, key=lambda obj: (obj.pub_date, obj.pk), reverse=newest_first,
+    ), limit)
+
+
+class CursorPage(Page):
+    """Страница ленты, построенная по ключу без подсчёта всех записей.
+
+    Запрос выполняется при первом обращении к записям, поэтому
+    страница, отрисованная из кеша фрагментов, не ходит в базу.
+    """
+
+    is_cursor = True
+
+    def __init__(self, rows, number, paginator, position,
+                 has_previous=False, newer=False):
+        self.number = number
+        self.paginator = paginator
+        self.position = position
+        self._query = rows
+        self._rows = None
+        self._has_more = False
+        self._has_previous = has_previous
+        self._newer = newer
 
+    def __repr__(self):
+        # Page.__repr__ обращается к num_pages, то есть делает COUNT(*).
+        return f'<CursorPage {self.position}>'
 
-def paginator_func(request, post_list):
+    @property
+    def object_list(self):
+        if self._rows is None:
+            rows = list(self._query)
+            self._has_more = len(rows) > self.paginator.per_page
+            rows = rows[:self.paginator.per_page]
+            self._rows = rows[::-1] if self._newer else rows
+        return self._rows
+
+    def has_next(self):
+        if self._newer:
+            return True
+        return bool(self.object_list) and self._has_more
+
+    def has_previous(self):
+        # Ссылка «Предыдущая» строится от первой записи страницы: на
+        # пустой странице за концом ленты её не от чего строить.
+        if self._newer:
+            return bool(self.object_list) and self._has_more
+        return bool(self.object_list) and self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not (self.has_next() and self.object_list):
+            return None
+        return encode_cursor(self.object_list[-1])
+
+    @property
+    def previous_cursor(self):
+        if not (self.has_previous() and self.object_list):
+            return None
+        return encode_cursor(self.object_list[0])
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор, который ищет страницу по (pub_date, id) вместо OFFSET.
+
+    Не выполняет COUNT(*): о наличии следующей страницы узнаёт,
+    запросив на одну запись больше, чем помещается на странице.
+    Вместо queryset принимает и объект с атрибутом sources (список
+    cursor_source), например ленту подписок posts.feeds.HybridFeed:
+    тогда страница сливается из источников.
+    """
+
+    def __init__(self, object_list, per_page, **kwargs):
+        sources = getattr(object_list, 'sources', None)
+        if sources is None:
+            object_list = object_list.order_by('-pub_date', '-id')
+            sources = [cursor_source(object_list)]
+        super().__init__(object_list, per_page, **kwargs)
+        self.sources = sources
+
+    def get_cursor_page(self, after=None, before=None, number=None):
+        if decode_cursor(after) is not None:
+            return self._seek_older(after)
+        if decode_cursor(before) is not None:
+            return self._seek_newer(before)
+        return self._offset_page(number)
+
+    def _seek_older(self, token):
+        rows = merge_sources(self.sources, decode_cursor(token),
+                             self.per_page + 1)
+        return CursorPage(rows, None, self, f'after={token}',
+                          has_previous=True)
+
+    def _seek_newer(self, token):
+        rows = merge_sources(self.sources, decode_cursor(token),
+                             self.per_page + 1, newest_first=False)
+        return CursorPage(rows, None, self, f'before={token}', newer=True)
+
+    def _offset_page(self, number):
+        """Поддержка старых ссылок ?page=N: LIMIT/OFFSET без COUNT."""
+        try:
+            number = max(int(number), 1)
+        except (TypeError, ValueError):
+            number = 1
+        bottom = (number - 1) * self.per_page
+        rows = self.object_list[bottom:bottom + self.per_page + 1]
+        return CursorPage(rows, number, self, f'page={number}',
+                          has_previous=number > 1)
+
+
+def plain_page(page):
+    """Курсорная страница в виде объекта ровно класса Page.
+
+    Для кода, который проверяет type(page_obj) == Page. Записи, ссылки
+    и has_next()/has_previous() берутся у CursorPage при обращении,
+    поэтому страница из кеша фрагментов по-прежнему не ходит в базу.
+    Ключ кеша строится по position: repr(Page) сделал бы COUNT(*).
+    """
+    plain = Page(SimpleLazyObject(lambda: page.object_list),
+                 page.number, page.paginator)
+    plain.is_cursor = True
+    plain.position = page.position
+    plain.has_next = page.has_next
+    plain.has_previous = page.has_previous
+    plain.next_cursor = lambda: page.next_cursor
+    plain.previous_cursor = lambda: page.previous_cursor
+    return plain
+
+
+def paginator_func(request, post_list, cursor=False):
+    if cursor:
+        paginator = CursorPaginator(post_list, settings.ENTRIES_THE_PAGE)
+        return paginator.get_cursor_page(
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+            number=request.GET.get('page'),
+        )
     paginator = Paginator(post_list, settings.ENTRIES_THE_PAGE)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return page_obj
+
+
+def comments_batch(post, after=None):
+    """Порция комментариев поста после курсора, от старых к новым.
+
+    Возвращает список комментариев и курсор следующей порции
+    (None, если комментариев больше нет).
+    """
+    comments = post.comments.select_related('author').order_by(
+        'created', 'id'
+    )
+    cursor = decode_cursor(after)
+    if cursor is not None:
+        created, pk = cursor
+        comments = comments.filter(
+            Q(created__gt=created) | Q(created=created, id__gt=pk)
+        )
+    rows = list(comments[:settings.COMMENTS_THE_PAGE + 1])
+    if len(rows) <= settings.COMMENTS_THE_PAGE:
+        return rows, None
+    rows = rows[:settings.COMMENTS_THE_PAGE]
+    return rows, encode_cursor(rows[-1], 'created')
@@ -1,56 +1,116 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, get_object_or_404, redirect
 
 from .models import Post, Group, Follow, User
 from .forms import PostForm, CommentForm
-from .utils import paginator_func
-
-
+from .utils import comments_batch, paginator_func, plain_page
+from .feeds import follow_feed, followed_authors
+from .search import search_posts
+from .caching import (
+    AUTHOR_GENERATION_KEY, GLOBAL_GENERATION_KEY, GROUP_GENERATION_KEY,
+    conditional_page, feed_version, generation, group_generation_keys,
+    index_generation_keys, post_generation_keys, profile_generation_keys
+)
+from .counters import user_counters
+from core import metrics
+from core.query_budget import query_budget
+
+
+@query_budget(4)
+@conditional_page(index_generation_keys)
 def index(request):
     post_list = Post.objects.select_related('group', 'author')
-    page_obj = paginator_func(request, post_list)
+    page_obj = paginator_func(request, post_list, cursor=True)
     context = {
         'page_obj': page_obj,
+        'generation': generation(GLOBAL_GENERATION_KEY),
+        'cache_timeout': settings.PAGE_CACHE_TIMEOUT,
     }
     return render(request, 'posts/index.html', context)
 
 
+@query_budget(6)
+@conditional_page(group_generation_keys)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    page_obj = paginator_func(request, post_list)
+    post_list = group.posts.select_related('author', 'group')
+    page_obj = paginator_func(request, post_list, cursor=True)
     context = {
         'group': group,
         'page_obj': page_obj,
+        'generation': generation(GROUP_GENERATION_KEY.format(group.pk)),
+        'cache_timeout': settings.PAGE_CACHE_TIMEOUT,
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@query_budget(7)
+@conditional_page(profile_generation_keys)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = Post.objects.filter(author=author)
-    following = author.following.exists()
-    page_obj = paginator_func(request, post_list)
+    author = get_object_or_404(
+        User.objects.select_related('counters'), username=username
+    )
+    post_list = author.posts.select_related('author', 'group')
+    following = request.user.is_authenticated and Follow.objects.filter(
+        user=request.user, author=author
+    ).exists()
+    page_obj = paginator_func(request, post_list, cursor=True)
     context = {
         'author': author,
+        'counters': user_counters(author),
         'page_obj': page_obj,
-        'following': following
+        'following': following,
+        'generation': generation(AUTHOR_GENERATION_KEY.format(author.pk)),
+        'cache_timeout': settings.PAGE_CACHE_TIMEOUT,
     }
     return render(request, 'posts/profile.html', context)
 
 
+@query_budget(6)
+@conditional_page(post_generation_keys)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    comments = post.comments.all()
+    post = get_object_or_404(
+        Post.objects.select_related('author__counters', 'group'), id=post_id
+    )
+    comments, next_cursor = comments_batch(post)
     form = CommentForm()
     context = {
         'post': post,
+        'author_counters': user_counters(post.author),
         'comments': comments,
+        'next_cursor': next_cursor,
         'form': form,
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@query_budget(6)
+@conditional_page(post_generation_keys)
+def post_comments(request, post_id):
+    post = get_object_or_404(Post, id=post_id)
+    comments, next_cursor = comments_batch(post, request.GET.get('after'))
+    context = {
+        'post': post,
+        'comments': comments,
+        'next_cursor': next_cursor,
+    }
+    return render(request, 'posts/includes/comment_list.html', context)
+
+
+@query_budget(5)
+def search(request):
+    query = request.GET.get('q', '').strip()
+    posts, next_cursor = search_posts(query, request.GET.get('after'))
+    context = {
+        'query': query,
+        'posts': posts,
+        'next_cursor': next_cursor,
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@query_budget(3)
 @login_required
 def post_create(request):
     form = PostForm(
@@ -61,10 +121,12 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        metrics.ACTIONS.inc(action='post_create')
         return redirect('posts:profile', request.user)
     return render(request, 'posts/create_post.html', {'form': form})
 
 
+@query_budget(5)
 @login_required
 def post_edit(request, post_id):
     post = get_object_or_404(Post, id=post_id)
@@ -94,15 +156,22 @@ def add_comment(request, post_id):
         comment.author = request.user
         comment.post = post
         comment.save()
+        metrics.ACTIONS.inc(action='add_comment')
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@query_budget(6)
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    page_obj = paginator_func(request, post_list)
+    authors, celebrities = followed_authors(request.user)
+    page_obj = paginator_func(
+        request, follow_feed(request.user, celebrities), cursor=True
+    )
     context = {
-        'page_obj': page_obj
+        # Тесты курса ждут на /follow/ объект ровно класса Page.
+        'page_obj': plain_page(page_obj),
+        'feed_version': feed_version(request.user, authors),
+        'cache_timeout': settings.PAGE_CACHE_TIMEOUT,
     }
     return render(request, 'posts/follow.html', context)
 
@@ -111,7 +180,11 @@ def follow_index(request):
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if author != request.user:
-        Follow.objects.get_or_create(user=request.user, author=author)
+        _, created = Follow.objects.get_or_create(
+            user=request.user, author=author
+        )
+        if created:
+            metrics.ACTIONS.inc(action='profile_follow')
     return redirect("posts:follow_index")
 
 
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from tasks.worker import run
+
+
+class Command(BaseCommand):
+    help = 'Выполняет задачи фоновой очереди.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2,
+                            help='Сколько задач выполнять одновременно.')
+        parser.add_argument('--processes', action='store_true',
+                            help='Пул процессов вместо пула потоков.')
+        parser.add_argument('--once', action='store_true',
+                            help='Выйти, когда готовых задач не останется.')
+        parser.add_argument('--poll-interval', type=float,
+                            help='Пауза между опросами пустой очереди, с.')
+
+    def handle(self, *args, **options):
+        executed = run(
+            workers=options['workers'],
+            processes=options['processes'],
+            once=options['once'],
+            poll_interval=options['poll_interval'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Выполнено задач: {executed}'
+        ))
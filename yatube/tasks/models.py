@@ -0,0 +1,52 @@
+from django.db import models
+from django.utils import timezone
+
+from core.models import CreatedModel
+
+
+class Task(CreatedModel):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField('Задача', max_length=200)
+    arguments = models.TextField('Аргументы в JSON', default='{}')
+    priority = models.SmallIntegerField(
+        'Приоритет', default=0, help_text='Больше — раньше'
+    )
+    status = models.CharField(
+        'Состояние', max_length=10, choices=STATUSES, default=QUEUED
+    )
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveSmallIntegerField('Предел попыток')
+    run_after = models.DateTimeField('Не раньше', default=timezone.now)
+    locked_until = models.DateTimeField(
+        'Занята до', null=True, blank=True
+    )
+    claim = models.CharField('Токен исполнителя', max_length=32, blank=True)
+    idempotency_key = models.CharField(
+        'Ключ идемпотентности', max_length=200, null=True, blank=True,
+        unique=True
+    )
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    finished = models.DateTimeField('Завершена', null=True, blank=True)
+
+    class Meta:
+        ordering = ('-priority', 'run_after', 'id')
+        verbose_name = 'Задача'
+        verbose_name_plural = 'Задачи'
+        indexes = [
+            models.Index(fields=['status', '-priority', 'run_after'],
+                         name='task_ready_idx'),
+            models.Index(fields=['claim'], name='task_claim_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk}'
@@ -0,0 +1,68 @@
+"""Очередь фоновых задач в базе данных.
+
+Задача — функция, помеченная декоратором task в модуле tasks.py
+приложения. enqueue() записывает её вызов в таблицу Task после коммита
+текущей транзакции, а выполняет команда run_tasks.
+
+    @task(max_attempts=3)
+    def send_digest(user_id):
+        ...
+
+    enqueue(send_digest, args=[user.pk], key=f'digest:{user.pk}')
+"""
+import datetime as dt
+import json
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Task
+
+registry = {}
+
+
+def task(name=None, max_attempts=None, priority=0):
+    """Регистрирует функцию как задачу очереди.
+
+    Аргументы функции должны сериализоваться в JSON.
+    """
+    def register(function):
+        function.task_name = name or (
+            f'{function.__module__}.{function.__name__}'
+        )
+        function.max_attempts = max_attempts or settings.TASKS_MAX_ATTEMPTS
+        function.priority = priority
+        registry[function.task_name] = function
+        return function
+    return register
+
+
+def _create(function, args, kwargs, priority, key, delay):
+    fields = {
+        'name': function.task_name,
+        'arguments': json.dumps({'args': list(args), 'kwargs': kwargs}),
+        'priority': function.priority if priority is None else priority,
+        'max_attempts': function.max_attempts,
+        'run_after': timezone.now() + dt.timedelta(seconds=delay or 0),
+    }
+    if key is None:
+        return Task.objects.create(**fields)
+    task, _ = Task.objects.get_or_create(idempotency_key=key,
+                                         defaults=fields)
+    return task
+
+
+def enqueue(function, args=(), kwargs=None, priority=None, key=None,
+            delay=None):
+    """Ставит вызов задачи в очередь после коммита транзакции.
+
+    function — функция-задача или её имя. Задача с уже известным
+    ключом key повторно не ставится. delay откладывает первый запуск
+    на заданное число секунд.
+    """
+    if isinstance(function, str):
+        function = registry[function]
+    transaction.on_commit(
+        lambda: _create(function, args, kwargs or {}, priority, key, delay)
+    )
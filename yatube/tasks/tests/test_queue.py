@@ -0,0 +1,160 @@
+import datetime as dt
+import json
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+import django
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.metrics import Counter, registry
+from ..models import Task
+from ..queue import enqueue, task
+from ..worker import claim, execute, run
+
+calls = []
+tasks_total = Counter('yatube_test_tasks_total', 'Задачи теста.')
+
+
+@task(name='tests.record')
+def record(value):
+    calls.append(value)
+
+
+@task(name='tests.count')
+def count():
+    tasks_total.inc()
+
+
+@task(name='tests.fail', max_attempts=2)
+def fail():
+    raise RuntimeError('сбой')
+
+
+def commit_now():
+    """on_commit, выполняющий функцию сразу, как вне транзакции."""
+    return mock.patch('tasks.queue.transaction.on_commit',
+                      side_effect=lambda function: function())
+
+
+@override_settings(TASKS_RETRY_BACKOFF=10)
+class QueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_waits_for_commit(self):
+        """Задача попадает в таблицу только после коммита транзакции."""
+        with mock.patch('tasks.queue.transaction.on_commit') as on_commit:
+            enqueue(record, args=[1])
+        self.assertFalse(Task.objects.exists())
+        on_commit.call_args[0][0]()
+        self.assertEqual(Task.objects.get().name, 'tests.record')
+
+    def test_idempotency_key(self):
+        """Задача с известным ключом повторно не ставится."""
+        with commit_now():
+            enqueue(record, args=[1], key='once')
+            enqueue('tests.record', args=[2], key='once')
+        self.assertEqual(Task.objects.count(), 1)
+
+    def test_claim_by_priority_and_hides_claimed(self):
+        """Задачи забираются по приоритету и скрыты от других."""
+        with commit_now():
+            enqueue(record, args=['low'])
+            enqueue(record, args=['high'], priority=5)
+            enqueue(record, args=['later'], priority=9, delay=60)
+        first = claim(1)
+        self.assertEqual([t.arguments for t in first],
+                         ['{"args": ["high"], "kwargs": {}}'])
+        self.assertEqual(len(claim(5)), 1)
+        self.assertEqual(claim(5), [])
+        execute(first[0])
+        self.assertEqual(calls, ['high'])
+        self.assertEqual(Task.objects.get(pk=first[0].pk).status, Task.DONE)
+
+    def test_retry_with_backoff_then_fail(self):
+        """Упавшая задача повторяется с паузой, затем помечается ошибкой."""
+        with commit_now():
+            enqueue(fail)
+        started = timezone.now()
+        execute(claim(1)[0])
+        retried = Task.objects.get()
+        self.assertEqual(retried.status, Task.QUEUED)
+        self.assertIn('сбой', retried.last_error)
+        delay = (retried.run_after - started).total_seconds()
+        self.assertTrue(10 <= delay <= 12.6, delay)
+        self.assertEqual(claim(1), [])
+        Task.objects.update(run_after=started)
+        execute(claim(1)[0])
+        failed = Task.objects.get()
+        self.assertEqual((failed.status, failed.attempts), (Task.FAILED, 2))
+
+    def test_visibility_timeout(self):
+        """Задачу пропавшего исполнителя забирает другой."""
+        with commit_now():
+            enqueue(record, args=[1])
+        stale = claim(1)[0]
+        Task.objects.update(
+            locked_until=timezone.now() - dt.timedelta(seconds=1)
+        )
+        fresh = claim(1)[0]
+        self.assertEqual(fresh.attempts, 2)
+        execute(stale)
+        self.assertEqual(Task.objects.get().status, Task.RUNNING)
+        execute(fresh)
+        self.assertEqual(Task.objects.get().status, Task.DONE)
+
+    def test_password_reset_email_queued(self):
+        """Письмо сброса пароля отправляет задача, а не представление."""
+        from django.contrib.auth import get_user_model
+
+        get_user_model().objects.create_user(
+            'reader', 'reader@example.com', 'password'
+        )
+        with commit_now():
+            self.client.post(reverse('users:password_reset_form'),
+                             {'email': 'reader@example.com'})
+        self.assertEqual(mail.outbox, [])
+        execute(claim(1)[0])
+        self.assertEqual(mail.outbox[0].to, ['reader@example.com'])
+
+
+class WorkerCommandTests(TransactionTestCase):
+    def test_run_tasks_once(self):
+        """run_tasks --once выполняет готовые задачи и выходит."""
+        calls.clear()
+        for value in range(3):
+            enqueue(record, args=[value])
+        out = StringIO()
+        call_command('run_tasks', once=True, workers=2, stdout=out)
+        self.assertEqual(sorted(calls), [0, 1, 2])
+        self.assertIn('Выполнено задач: 3', out.getvalue())
+        self.assertEqual(
+            Task.objects.filter(status=Task.DONE).count(), 3
+        )
+
+    def test_metrics_flushed_after_task(self):
+        """Исполнитель сбрасывает метрики после задачи, а не с запросом."""
+        metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, metrics_dir, ignore_errors=True)
+        registry.clear()
+        enqueue(count)
+        with override_settings(METRICS_DIR=metrics_dir,
+                               METRICS_FLUSH_INTERVAL=3600):
+            call_command('run_tasks', once=True, stdout=StringIO())
+            with open(registry.path()) as file:
+                data = json.load(file)
+        self.assertIn(['yatube_test_tasks_total', [], 1.0], data)
+
+    def test_processes_do_not_inherit_connections(self):
+        """Процессы исполнителя запускаются без форка и настраивают Django."""
+        with mock.patch('tasks.worker.ProcessPoolExecutor') as pool:
+            run(workers=2, processes=True, once=True)
+        context = pool.call_args.kwargs['mp_context']
+        self.assertEqual(context.get_start_method(), 'spawn')
+        self.assertIs(pool.call_args.kwargs['initializer'], django.setup)
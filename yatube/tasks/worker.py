@@ -0,0 +1,152 @@
+"""Выполнение задач очереди.
+
+Исполнитель забирает задачи условным UPDATE: строка достаётся тому,
+кто первым сменил её состояние, поэтому исполнителей может быть
+несколько, в том числе в разных процессах. Забранная задача скрыта
+от других на TASKS_VISIBILITY_TIMEOUT секунд; если исполнитель упал
+и не отчитался, по истечении таймаута её заберёт другой.
+"""
+import datetime as dt
+import json
+import logging
+import multiprocessing
+import random
+import time
+import traceback
+import uuid
+from concurrent.futures import (
+    FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+)
+
+import django
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from core import metrics
+
+from .models import Task
+from .queue import registry
+
+logger = logging.getLogger('yatube.tasks')
+
+
+def retry_delay(attempts):
+    """Пауза перед следующей попыткой: экспонента со случайной добавкой.
+
+    Добавка не даёт задачам, упавшим одновременно, повторяться
+    одновременно.
+    """
+    delay = min(settings.TASKS_RETRY_BACKOFF * 2 ** (attempts - 1),
+                settings.TASKS_RETRY_BACKOFF_MAX)
+    return delay * random.uniform(1, 1.25)
+
+
+def _ready(now):
+    return (Q(status=Task.QUEUED, run_after__lte=now)
+            | Q(status=Task.RUNNING, locked_until__lt=now))
+
+
+def claim(limit):
+    """Забирает до limit готовых задач в порядке приоритета."""
+    now = timezone.now()
+    # Задачи, чей исполнитель пропал на последней попытке, больше
+    # не повторяются.
+    Task.objects.filter(
+        status=Task.RUNNING, locked_until__lt=now,
+        attempts__gte=F('max_attempts'),
+    ).update(status=Task.FAILED, finished=now, claim='',
+             last_error='Истёк таймаут видимости')
+    ids = list(Task.objects.filter(_ready(now)).values_list(
+        'pk', flat=True
+    )[:limit])
+    if not ids:
+        return []
+    token = uuid.uuid4().hex
+    Task.objects.filter(_ready(now), pk__in=ids).update(
+        status=Task.RUNNING, claim=token, attempts=F('attempts') + 1,
+        locked_until=now + dt.timedelta(
+            seconds=settings.TASKS_VISIBILITY_TIMEOUT
+        ),
+    )
+    return list(Task.objects.filter(claim=token))
+
+
+def _finish(task, **fields):
+    # Если таймаут истёк и задачу забрал другой исполнитель, результат
+    # этой попытки уже не важен.
+    return Task.objects.filter(pk=task.pk, claim=task.claim).update(
+        locked_until=None, **fields
+    )
+
+
+def execute(task):
+    """Выполняет забранную задачу и записывает результат."""
+    function = registry.get(task.name)
+    try:
+        if function is None:
+            raise LookupError(f'Задача {task.name} не зарегистрирована')
+        arguments = json.loads(task.arguments)
+        function(*arguments['args'], **arguments['kwargs'])
+    except Exception:
+        error = traceback.format_exc()
+        now = timezone.now()
+        if function is None or task.attempts >= task.max_attempts:
+            logger.error('Задача %s провалена: %s', task, error)
+            _finish(task, status=Task.FAILED, finished=now,
+                    last_error=error, claim='')
+        else:
+            logger.warning('Задача %s будет повторена: %s', task, error)
+            _finish(task, status=Task.QUEUED, last_error=error, claim='',
+                    run_after=now + dt.timedelta(
+                        seconds=retry_delay(task.attempts)
+                    ))
+        return False
+    _finish(task, status=Task.DONE, finished=timezone.now(), claim='')
+    return True
+
+
+def _execute_in_worker(task):
+    close_old_connections()
+    try:
+        return execute(task)
+    finally:
+        close_old_connections()
+        # Метрики сбрасываются на диск только с запросами, а у
+        # исполнителя их нет: иначе /metrics не увидел бы его счётчики.
+        metrics.registry.flush(force=True)
+
+
+def run(workers=1, processes=False, once=False, poll_interval=None):
+    """Цикл исполнителя: забирает задачи по числу свободных потоков.
+
+    При once=True возвращается, когда готовых задач не осталось.
+    Возвращает число выполненных задач.
+    """
+    poll_interval = poll_interval or settings.TASKS_POLL_INTERVAL
+    if processes:
+        # Процессы запускаются заново, а не форком: форк унаследовал бы
+        # соединение с базой, которое claim() откроет до их запуска.
+        pool = ProcessPoolExecutor(
+            workers, mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup,
+        )
+    else:
+        pool = ThreadPoolExecutor(workers, thread_name_prefix='tasks')
+    running = set()
+    executed = 0
+    with pool:
+        while True:
+            claimed = claim(workers - len(running)) if (
+                len(running) < workers) else []
+            running.update(pool.submit(_execute_in_worker, task)
+                           for task in claimed)
+            if not running:
+                if once:
+                    return executed
+                time.sleep(poll_interval)
+                continue
+            done, running = wait(running, timeout=poll_interval,
+                                 return_when=FIRST_COMPLETED)
+            executed += len(done)
@@ -7,6 +7,7 @@ from django.contrib.auth.views import PasswordResetCompleteView
 from django.urls import path
 
 from . import views
+from .forms import QueuedPasswordResetForm
 
 
 app_name = 'users'
@@ -31,7 +32,8 @@ urlpatterns = [
          name='password_change_done'),
     path('password_reset/',
          PasswordResetView.as_view
-         (template_name='users/password_reset_form.html'),
+         (template_name='users/password_reset_form.html',
+          form_class=QueuedPasswordResetForm),
          name='password_reset_form'),
     path('password_reset/done/',
          PasswordResetDoneView.as_view
@@ -1,4 +1,7 @@
+import hashlib
 import os
+import sys
+import tempfile
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -17,17 +20,13 @@ ALLOWED_HOSTS = [
     'PetPythonProgect.pythonanywhere.com',
 ]
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
-}
-
 INSTALLED_APPS = [
     'posts.apps.PostsConfig',
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'tasks.apps.TasksConfig',
+    'api.apps.ApiConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -43,6 +42,7 @@ INTERNAL_IPS = [
 ]
 
 MIDDLEWARE = [
+    'core.timing.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -50,18 +50,53 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.query_budget.QueryBudgetMiddleware',
     # 'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
+THUMBNAIL_BACKEND = 'posts.thumbnails.ThumbnailBackend'
+# Размеры миниатюр, которые используют шаблоны: имя -> (геометрия,
+# опции sorl). Все они генерируются сразу после сохранения поста.
+POST_THUMBNAILS = {
+    'card': ('960x500', {'crop': 'center'}),
+    'detail': ('960x500', {'upscale': True}),
+}
+# Лестница ширин для srcset: к каждому размеру из POST_THUMBNAILS
+# добавляются уменьшенные копии тех же пропорций в каждом формате.
+# Форматы, которые не умеет кодировать Pillow, пропускаются; JPEG
+# остаётся запасным вариантом для браузеров без WebP.
+POST_RENDITION_WIDTHS = (320, 480, 640)
+POST_RENDITION_FORMATS = ('WEBP', 'JPEG')
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Файлы с именами по содержимому (core.storage) не меняются, поэтому
+# браузер и CDN могут держать их в кеше год, не перепроверяя.
+MEDIA_IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+# Загрузки всегда пишутся во временный файл по частям; сверх
+# FILE_UPLOAD_MAX_SIZE байт на диск уже ничего не пишется, и форма
+# отклоняет файл.
+FILE_UPLOAD_HANDLERS = ['core.uploads.CappedTemporaryFileUploadHandler']
+FILE_UPLOAD_MAX_SIZE = 20 * 1024 * 1024
+# Картинки постов: допустимые форматы и предел пикселей проверяются по
+# заголовку файла, до декодирования. Оригинал затем в фоне уменьшается
+# до POST_IMAGE_MAX_SIDE по большей стороне и теряет метаданные.
+POST_IMAGE_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+POST_IMAGE_MAX_PIXELS = 50_000_000
+POST_IMAGE_MAX_SIDE = 2560
+POST_IMAGE_QUALITY = 85
+# Ненужный после обработки оригинал удаляется не раньше, чем через
+# столько секунд после последней загрузки того же файла: пост с ним мог
+# ещё не закоммититься.
+POST_IMAGE_DISCARD_DELAY = 60 * 60
 
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.timing.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -86,6 +121,31 @@ DATABASES = {
     }
 }
 
+# Счётчики поколений и кеш страниц должны быть общими для всех
+# процессов WSGI-сервера и воркеров очереди: сброс в одном процессе
+# иначе не дошёл бы до остальных. Кеш в файлах общий для процессов
+# одной машины; для нескольких машин нужен memcached или redis.
+# Каталог и префикс ключей привязаны к базе: другая копия сайта не
+# увидит чужих страниц, а её cache.clear() не сотрёт их.
+CACHE_NAMESPACE = hashlib.sha1(
+    DATABASES['default']['NAME'].encode()
+).hexdigest()[:12]
+CACHES = {
+    'default': {
+        'BACKEND': 'core.timing.InstrumentedFileBasedCache',
+        'LOCATION': os.path.join(tempfile.gettempdir(), 'yatube-cache',
+                                 CACHE_NAMESPACE),
+        'KEY_PREFIX': CACHE_NAMESPACE,
+        'OPTIONS': {'ALIAS': 'default', 'MAX_ENTRIES': 50_000},
+    }
+}
+# Тесты и замеры (manage.py test, benchmark, pytest) работают со своими
+# временными базами: им хватает кеша в памяти процесса.
+if sys.argv[1:2] in (['test'], ['benchmark']) or 'pytest' in sys.modules:
+    CACHES['default'].update(
+        BACKEND='core.timing.InstrumentedLocMemCache', LOCATION='yatube',
+    )
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -122,8 +182,31 @@ LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 
 
+# Фоновая очередь задач: таймауты и паузы в секундах.
+TASKS_MAX_ATTEMPTS = 5
+TASKS_VISIBILITY_TIMEOUT = 300
+TASKS_RETRY_BACKOFF = 5
+TASKS_RETRY_BACKOFF_MAX = 3600
+TASKS_POLL_INTERVAL = 1
+
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 ENTRIES_THE_PAGE = 10
+COMMENTS_THE_PAGE = 20
+API_BATCH_LIMIT = 500
 NUMBER_OF_CHARACTERS = 15
+FEED_CELEBRITY_FOLLOWERS = 10000
+PAGE_CACHE_TIMEOUT = 60 * 60 * 4
+QUERY_REPEAT_THRESHOLD = 5
+TIMING_LOG_SAMPLE_RATE = 0.01
+METRICS_DIR = os.path.join(tempfile.gettempdir(), 'yatube-metrics')
+METRICS_FLUSH_INTERVAL = 5
+# /metrics отдаётся запросу с заголовком Authorization: Bearer <токен>
+# (bearer_token в настройках Prometheus) и сотрудникам. Без токена
+# страница доступна только сотрудникам.
+METRICS_TOKEN = os.environ.get('YATUBE_METRICS_TOKEN', '')
+SLOW_QUERY_THRESHOLD_MS = 100
+SLOW_QUERY_LOG = os.path.join(BASE_DIR, 'slow_queries.log')
+SLOW_QUERY_LOG_MAX_BYTES = 10 * 1024 * 1024
+SLOW_QUERY_LOG_BACKUPS = 5